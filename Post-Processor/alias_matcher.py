@@ -0,0 +1,244 @@
+"""
+alias_matcher.py
+Description: Multi-pattern matcher used by processor.py to find every
+in-scope text alias and twitter handle of a document in a single pass.
+The patterns are compiled once into an Aho-Corasick automaton so the
+cost of matching an article no longer grows with the size of the scope.
+A prefilter on the words of the document rejects most documents, and
+most aliases of the others, before the automaton or str.find runs.
+"""
+import re
+
+# characters that must surround a text alias for it to count as a match,
+# same as the ( |\"|') alias ( |\"|'|,) pattern used by the processor
+ALIAS_PREFIX = ' "\''
+ALIAS_SUFFIX = ' "\','
+EMPTY_ALIAS_PATTERN = re.compile(r"( |\"|')( |\"|'|,)")
+WORD = re.compile(r'\w+')
+# words right after an '@', where a handle key's first word starts
+AT_WORD = re.compile(r'@(\w+)')
+# above this many candidate keys a document is scanned by the automaton
+# instead of looking up each candidate with str.find
+AUTOMATON_MIN_CANDIDATES = 32
+
+
+def common_word(word):
+    """Returns True for the words likely found in any document, numbers
+    and words shorter than three characters, avoided by the prefilter."""
+    return len(word) < 3 or word.isdigit()
+
+
+class AhoCorasick:
+    """
+    An Aho-Corasick automaton over a set of (lowercase) keys.
+    Keys are added with add(), then build() computes the failure links.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+    def add(self, key):
+        """Adds key to the trie, key must be a non empty string."""
+        state = 0
+        for ch in key:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = next_state
+        if key not in self._out[state]:
+            self._out[state] = self._out[state] + (key,)
+
+    def build(self):
+        """Computes failure links breadth first and merges the outputs
+        of each state with the outputs of its failure state."""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(ch, 0)
+                self._fail[next_state] = fail
+                self._out[next_state] = self._out[next_state] + \
+                    tuple(key for key in self._out[fail]
+                          if key not in self._out[next_state])
+                queue.append(next_state)
+
+    def search(self, text):
+        """
+        Scans text once and returns a list of (start, end, key)
+        for every occurrence of every key, overlapping ones included.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for key in out[state]:
+                    matches.append((end - len(key), end, key))
+        return matches
+
+
+class AliasMatcher:
+    """
+    Finds the text aliases and twitter handles of a scope in a document.
+    Built once from the scope dictionary returned by load_scope.
+    Matching is case insensitive, a text alias must be surrounded
+    by a space, quote or comma and a handle must be preceded by '@'.
+
+    The prefilter: since an alias is surrounded by characters that are
+    not part of a word, each word of an alias is a whole word of the
+    document it occurs in, so an alias is only a candidate if its rarest
+    word (not a common_word if it can, then the one in the fewest
+    aliases, then the longest) is. A handle
+    key is only a candidate if its first word starts a word that follows
+    an '@' in the document. Keys without a word are always candidates.
+    Documents without candidates are rejected without being scanned.
+    stats counts the documents, the rejected ones, the candidate keys
+    and the documents scanned by the automaton, see take_stats().
+    """
+
+    def __init__(self, scope):
+        self.automaton = AhoCorasick()
+        # lowercase key -> list of (order, kind, source, original text),
+        # order is the position of the alias or handle in the scope
+        self.entries = {}
+        self.has_empty_alias = False
+        self.stats = {'documents': 0, 'rejected': 0, 'candidate_keys': 0,
+                      'automaton': 0}
+        order = 0
+        for source, info in scope.items():
+            for alias in info['aliases']:
+                if alias == '':
+                    self.has_empty_alias = True
+                else:
+                    self.automaton.add(alias.lower())
+                self.entries.setdefault(alias.lower(), []).append(
+                    (order, 'alias', source, alias))
+                order += 1
+            for handle in info['twitter_handles']:
+                key = ('@' + handle).lower()
+                self.automaton.add(key)
+                self.entries.setdefault(key, []).append(
+                    (order, 'handle', source, handle))
+                order += 1
+        self.automaton.build()
+        self._build_prefilter()
+
+    def _build_prefilter(self):
+        """Computes the words the prefilter looks up for each key."""
+        # rare word -> alias keys, first word of a handle key -> handle keys
+        self.alias_words = {}
+        self.handle_words = {}
+        # keys without a word, candidates of every document
+        self.always = set()
+        counts = {}
+        for key in self.entries:
+            for word in set(WORD.findall(key)):
+                counts[word] = counts.get(word, 0) + 1
+        for key, entries in self.entries.items():
+            if key == '':
+                continue
+            words = WORD.findall(key)
+            if not words:
+                self.always.add(key)
+                continue
+            kinds = {kind for _, kind, _, _ in entries}
+            if 'alias' in kinds:
+                rare = min(words, key=lambda word: (common_word(word), counts[word], -len(word)))  # nopep8
+                self.alias_words.setdefault(rare, set()).add(key)
+            if 'handle' in kinds:
+                if key[key.index(words[0]) - 1] == '@':
+                    self.handle_words.setdefault(words[0], set()).add(key)
+                else:
+                    self.always.add(key)
+        self.handle_lengths = sorted({len(word) for word in self.handle_words})  # nopep8
+
+    def candidates(self, text):
+        """
+        Returns the keys that may occur in text, a lowercase document.
+        The others can not occur in it.
+        """
+        keys = set(self.always)
+        for word in set(WORD.findall(text)) & self.alias_words.keys():
+            keys |= self.alias_words[word]
+        if self.handle_words and '@' in text:
+            for word in set(AT_WORD.findall(text)):
+                for length in self.handle_lengths:
+                    if length > len(word):
+                        break
+                    keys |= self.handle_words.get(word[:length], set())
+        return keys
+
+    def take_stats(self):
+        """Returns the prefilter stats counted so far and resets them."""
+        stats = self.stats
+        self.stats = dict.fromkeys(stats, 0)
+        return stats
+
+    def find(self, text):
+        """
+        Returns two sets, the lowercase aliases and the lowercase
+        '@handle' keys that occur in text. Only the candidates of the
+        prefilter are looked for, so the second set may miss keys that
+        are only text aliases.
+        """
+        text = text.lower()
+        aliases, handles = set(), set()
+        candidates = self.candidates(text)
+        self.stats['documents'] += 1
+        self.stats['candidate_keys'] += len(candidates)
+        if not candidates:
+            self.stats['rejected'] += 1
+        elif len(candidates) >= AUTOMATON_MIN_CANDIDATES:
+            self.stats['automaton'] += 1
+            for start, end, key in self.automaton.search(text):
+                self._add_match(text, start, end, key, aliases, handles)
+        else:
+            for key in candidates:
+                start = text.find(key)
+                while start != -1:
+                    self._add_match(text, start, start + len(key), key, aliases, handles)  # nopep8
+                    start = text.find(key, start + 1)
+        if self.has_empty_alias and EMPTY_ALIAS_PATTERN.search(text):
+            aliases.add('')
+        return aliases, handles
+
+    @staticmethod
+    def _add_match(text, start, end, key, aliases, handles):
+        handles.add(key)
+        if key not in aliases and start > 0 and text[start - 1] in ALIAS_PREFIX \
+                and end < len(text) and text[end] in ALIAS_SUFFIX:
+            aliases.add(key)
+
+    def found_by_source(self, text, with_handles=True):
+        """
+        Returns a dict of source to the list of its aliases and
+        handles found in text, in the order they appear in the scope.
+        Handles are left out if with_handles is False.
+        """
+        aliases, handles = self.find(text)
+        if not with_handles:
+            handles = set()
+        hits = []
+        for key in aliases | handles:
+            for order, kind, source, original in self.entries.get(key, ()):
+                if (kind == 'alias' and key in aliases) or \
+                        (kind == 'handle' and key in handles):
+                    hits.append((order, source, original))
+        found = {}
+        for order, source, original in sorted(hits):
+            found.setdefault(source, []).append(original)
+        return found
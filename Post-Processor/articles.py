@@ -0,0 +1,268 @@
+"""
+articles.py
+Description: Streaming access to the crawler output used by
+processor.py. Articles can be kept as light records whose large text
+fields are read back from their DomainOutput file only when needed,
+and the list and dict columns of the twitter csv files are parsed
+without going through ast.literal_eval for the common cases.
+"""
+import ast
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+from multiprocessing import Pool
+try:
+    # optional, a much faster json parser
+    import orjson
+except ImportError:
+    orjson = None
+
+# fields of a domain output file that an ArticleRecord with a path does
+# not keep in memory
+HEAVY_FIELDS = ('html_content', 'article_text')
+
+# the fields of domain articles and tweets kept in the slots of an
+# ArticleRecord, any other field is kept in its extra dict
+RECORD_FIELDS = ('id', 'url', 'domain', 'type', 'language', 'date', 'title',
+                 'author_metadata', 'author_metascraper', 'title_metascraper',
+                 'article_len', 'found_urls', 'completed', 'html_content',
+                 'article_text', 'Tags', 'Mentions', 'Associated Publisher',
+                 'citation url or text alias', 'citation name', 'anchor text')
+FIELD_INDEX = {field: index for index, field in enumerate(RECORD_FIELDS)}
+# fields whose few distinct values are shared by many articles
+INTERNED_FIELDS = ('domain', 'type', 'language')
+_MISSING = object()
+
+# a python list of single quoted strings without quotes or escapes in them
+SIMPLE_STR_LIST = re.compile(r"\[(?:'[^'\\\n]*'(?:, )?)*\]")
+SIMPLE_STR = re.compile(r"'([^'\\\n]*)'")
+# the mentions of a tweet's entities, a list of flat dicts
+MENTIONS_LIST = re.compile(r"'mentions': \[([^\[\]]*)\]")
+MENTION_USERNAME = re.compile(r"'username': '(\w*)'")
+
+
+def read_json(path):
+    """Reads the json file at path, with orjson if it is installed."""
+    if orjson is not None:
+        with open(path, 'rb') as json_file:
+            return orjson.loads(json_file.read())
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+def read_domain_file(path, light=False):
+    """
+    Reads the domain output file at path.
+    Returns (path, article, error), article is None and error is
+    a message if the file could not be read or parsed. If light is
+    True the HEAVY_FIELDS are dropped from the article.
+    """
+    try:
+        data = read_json(path)
+    except Exception as e:
+        return path, None, type(e).__name__ + ': ' + str(e)
+    if not isinstance(data, dict):
+        return path, None, 'not a json object'
+    data['id'] = os.path.splitext(os.path.basename(path))[0]
+    if light:
+        for field in HEAVY_FIELDS:
+            data.pop(field, None)
+    return path, data, None
+
+
+def _read_light_domain_file(path):
+    return read_domain_file(path, light=True)
+
+
+def iter_domain_files(path_to_json, num_procs=1, light=False, errors=None,
+                      file_names=None):
+    """
+    Yields (path, article) for each json file in path_to_json, in
+    directory order, or for each of file_names if they are given.
+    The article id is the file name without extension.
+    Files are read one at a time, or by a pool of num_procs processes
+    if num_procs > 1. Files that can not be read are logged, appended
+    to errors as (path, message) if a list is given, and skipped.
+    If light is True the HEAVY_FIELDS are dropped from each article.
+    """
+    if file_names is None:
+        file_names = [file_name for file_name in os.listdir(path_to_json)
+                      if file_name.endswith('.json')]
+    paths = [os.path.join(path_to_json, file_name) for file_name in file_names]
+    reader = _read_light_domain_file if light else read_domain_file
+    if num_procs > 1:
+        pool = Pool(num_procs)
+        results = pool.imap(reader, paths, chunksize=64)
+    else:
+        pool = None
+        results = map(reader, paths)
+    try:
+        for path, data, error in results:
+            if error is not None:
+                logging.warning('Could not load ' + path + ': ' + error)
+                if errors is not None:
+                    errors.append((path, error))
+                continue
+            yield path, data
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def parse_str_list(value):
+    """
+    Parses the repr of a list of strings, e.g. a citation_urls cell.
+    Lists of plain single quoted strings are parsed with a regex,
+    anything else goes through ast.literal_eval.
+    Raises ValueError or SyntaxError if value is not a python literal,
+    e.g. an empty cell or a NaN.
+    """
+    if not isinstance(value, str):
+        raise ValueError('not a list of strings: ' + repr(value))
+    if SIMPLE_STR_LIST.fullmatch(value):
+        return SIMPLE_STR.findall(value)
+    return ast.literal_eval(value)
+
+
+def parse_mentions(value):
+    """
+    Returns the usernames in the 'mentions' of the repr of a tweet's
+    entities dict, or [] if it has none or can not be parsed
+    (e.g. an empty cell or a NaN).
+    """
+    if not isinstance(value, str) or "'mentions'" not in value:
+        return []
+    match = MENTIONS_LIST.search(value)
+    if match is not None and match.group(1).count('{') == \
+            len(MENTION_USERNAME.findall(match.group(1))):
+        return MENTION_USERNAME.findall(match.group(1))
+    try:
+        entities = ast.literal_eval(value)
+        return [mention['username'] for mention in entities.get('mentions', [])]
+    except Exception:
+        return []
+
+
+class FoundUrl(tuple):
+    """
+    A found url of a domain article as a (title, url) tuple, which can
+    be indexed by 'title' and 'url' like the dict it replaces.
+    """
+    __slots__ = ()
+
+    def __new__(cls, link):
+        return tuple.__new__(cls, (link.get('title'), link.get('url')))
+
+    def __getitem__(self, key):
+        if key == 'url':
+            return tuple.__getitem__(self, 1)
+        if key == 'title':
+            return tuple.__getitem__(self, 0)
+        return tuple.__getitem__(self, key)
+
+    def to_dict(self):
+        return {'title': self[0], 'url': self[1]}
+
+
+def compact_links(links):
+    """Returns found_urls as a tuple, with the dicts of domain
+    articles as FoundUrls and the urls of tweets as they are."""
+    return tuple(FoundUrl(link) if isinstance(link, dict) else link
+                 for link in links)
+
+
+class ArticleRecord:
+    """
+    A domain article or tweet in far less memory than a dict, with
+    the same lookups: record[field], field in record, get(), keys(),
+    items() and update(). The values of the RECORD_FIELDS are kept in
+    one list, found_urls as a tuple of FoundUrls and the values of the
+    INTERNED_FIELDS are interned. Fewer and smaller objects also mean
+    fewer memory pages are copied when a forked process reads them.
+    If path is given the HEAVY_FIELDS are dropped and read back from
+    the article's file every time they are looked up, so they only stay
+    in memory while they are used.
+    """
+    __slots__ = ('_values', 'extra', 'path')
+
+    def __init__(self, data, path=None):
+        self._values = [_MISSING] * len(RECORD_FIELDS)
+        self.extra = None
+        self.path = path
+        for key, value in data.items():
+            if path is None or key not in HEAVY_FIELDS:
+                self[key] = value
+
+    def _get(self, key):
+        index = FIELD_INDEX.get(key)
+        if index is not None:
+            return self._values[index]
+        if self.extra is None:
+            return _MISSING
+        return self.extra.get(key, _MISSING)
+
+    def __getitem__(self, key):
+        value = self._get(key)
+        if value is _MISSING:
+            if self.path is not None and key in HEAVY_FIELDS:
+                return read_json(self.path)[key]
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key == 'found_urls' and isinstance(value, list):
+            value = compact_links(value)
+        elif key in INTERNED_FIELDS and isinstance(value, str):
+            value = sys.intern(value)
+        index = FIELD_INDEX.get(key)
+        if index is not None:
+            self._values[index] = value
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return self._get(key) is not _MISSING
+
+    def get(self, key, default=None):
+        """Returns the value of key, or default if it is not kept
+        (without reading the HEAVY_FIELDS back, like dict.get)."""
+        value = self._get(key)
+        return default if value is _MISSING else value
+
+    def keys(self):
+        keys = [field for field, value in zip(RECORD_FIELDS, self._values)
+                if value is not _MISSING]
+        if self.extra is not None:
+            keys.extend(self.extra)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        """Returns the (field, value) pairs kept, with found_urls as a
+        list of dicts or urls like in the crawler output."""
+        items = []
+        for key in self.keys():
+            value = self._get(key)
+            if key == 'found_urls' and isinstance(value, tuple):
+                value = [link.to_dict() if isinstance(link, FoundUrl) else link
+                         for link in value]
+            items.append((key, value))
+        return items
+
+    def update(self, other=(), **fields):
+        """Sets the fields of other, a dict or (field, value) pairs."""
+        if hasattr(other, 'items'):
+            other = other.items()
+        for key, value in itertools.chain(other, fields.items()):
+            self[key] = value
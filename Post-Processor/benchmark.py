@@ -0,0 +1,145 @@
+"""
+benchmark.py
+Description: Times each stage of processor.py on synthetic corpora
+(see synthetic_corpus.py) of 1k, 100k and 1M articles, to catch
+performance regressions before a production run does.
+Each corpus is generated once in <dir>/<articles>/, processor.py is run
+on it, after the Output/, Saved/ and tempFiles/ of an earlier run are
+removed, and the stage times are read from its Output/run_metrics.json.
+The results are printed and written to <dir>/results.json. Given the
+results of an earlier benchmark with -baseline=path, stages slower than
+their baseline by more than the tolerance are reported and the exit
+status is 1.
+Usage: python3 benchmark.py [-sizes=1000,100000,1000000] [-dir=path]
+    [-baseline=path] [-tolerance=0.25] [corpus options, see
+    synthetic_corpus.py] [-- processor.py options]
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import synthetic_corpus
+
+DEFAULTS = dict(synthetic_corpus.DEFAULTS, **{
+    'dir': './benchmark/',
+    'sizes': '1000,100000,1000000',
+    'baseline': '',
+    # a stage is slower than its baseline if it took more than
+    # (1 + tolerance) times as long and at least MIN_SECONDS longer
+    'tolerance': 0.25,
+})
+MIN_SECONDS = 0.5
+# benchmark stages and the run_metrics.json stages they add up
+STAGES = [('load_json', ('load_domain',)),
+          ('load_twitter_csv', ('load_twitter',)),
+          ('process_domain', ('match_domain',)),
+          ('process_twitter', ('match_twitter',)),
+          ('merge', ('merge',)),
+          ('cross_match', ('cross_match',)),
+          ('output', ('write_',))]
+PROCESSOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'processor.py')  # nopep8
+WORK_DIRS = ['logs', 'Output', 'Saved', 'tempFiles/Domain', 'tempFiles/Twitter']
+# folders of an earlier run removed before each run, e.g. output.csv is
+# appended to and Saved/ holds the checkpoint log
+RUN_DIRS = ['Output', 'Saved', 'tempFiles']
+
+
+def corpus_options(options, size):
+    """Returns the synthetic_corpus options of the corpus of size articles."""
+    corpus = {name: options[name] for name in synthetic_corpus.DEFAULTS}
+    corpus['articles'] = size
+    corpus['dir'] = os.path.join(options['dir'], str(size))
+    return corpus
+
+
+def prepare_corpus(corpus):
+    """Generates the corpus unless it was generated with the same options."""
+    path = os.path.join(corpus['dir'], 'corpus.json')
+    if os.path.exists(path):
+        with open(path) as saved:
+            if json.load(saved) == corpus:
+                return
+    print('generating', corpus['articles'], 'articles in', corpus['dir'])
+    synthetic_corpus.generate(corpus)
+    with open(path, 'w') as saved:
+        json.dump(corpus, saved)
+
+
+def stage_times(metrics):
+    """Returns benchmark stage -> seconds for the stages of metrics,
+    the content of a run_metrics.json."""
+    times = {}
+    for stage, prefixes in STAGES:
+        seconds = [value['seconds'] for name, value in metrics['stages'].items()
+                   if any(name == prefix or prefix.endswith('_') and name.startswith(prefix)  # nopep8
+                          for prefix in prefixes)]
+        if seconds:
+            times[stage] = round(sum(seconds), 3)
+    times['total'] = metrics['total_seconds']
+    return times
+
+
+def run_processor(work_dir, args):
+    """Runs processor.py with args in work_dir and returns the stage times."""
+    for folder in RUN_DIRS:
+        shutil.rmtree(os.path.join(work_dir, folder), ignore_errors=True)
+    for folder in WORK_DIRS:
+        os.makedirs(os.path.join(work_dir, folder), exist_ok=True)
+    with open(os.path.join(work_dir, 'stdout.txt'), 'w') as out:
+        subprocess.run([sys.executable, PROCESSOR] + args, cwd=work_dir,
+                       stdout=out, stderr=subprocess.STDOUT, check=True)
+    with open(os.path.join(work_dir, 'Output', 'run_metrics.json')) as metrics:
+        return stage_times(json.load(metrics))
+
+
+def regressions(results, baseline, tolerance):
+    """Returns (size, stage, seconds, baseline seconds) for each stage
+    of results slower than in baseline, see DEFAULTS['tolerance']."""
+    slower = []
+    for size, times in results.items():
+        for stage, seconds in times.items():
+            before = baseline.get(size, {}).get(stage)
+            if before is not None and seconds > before * (1 + tolerance) \
+                    and seconds - before >= MIN_SECONDS:
+                slower.append((size, stage, seconds, before))
+    return slower
+
+
+def print_results(results):
+    stages = [stage for stage, _ in STAGES] + ['total']
+    print('articles'.ljust(10) + ''.join(stage.rjust(18) for stage in stages))
+    for size, times in results.items():
+        print(size.ljust(10) + ''.join(str(times.get(stage, '-')).rjust(18)
+                                       for stage in stages))
+
+
+def main(args):
+    processor_args = []
+    if '--' in args:
+        processor_args = args[args.index('--') + 1:]
+        args = args[:args.index('--')]
+    options = synthetic_corpus.parse_options(args, DEFAULTS)
+    results = {}
+    for size in options['sizes'].split(','):
+        corpus = corpus_options(options, int(size))
+        prepare_corpus(corpus)
+        print('running processor.py on', size, 'articles')
+        results[size] = run_processor(corpus['dir'], processor_args)
+    print_results(results)
+    with open(os.path.join(options['dir'], 'results.json'), 'w') as out:
+        json.dump(results, out, indent=4)
+    if options['baseline']:
+        with open(options['baseline']) as saved:
+            baseline = json.load(saved)
+        slower = regressions(results, baseline, options['tolerance'])
+        for size, stage, seconds, before in slower:
+            print('REGRESSION', stage, 'on', size, 'articles took', seconds,
+                  'seconds instead of', before)
+        if slower:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
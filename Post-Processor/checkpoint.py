@@ -0,0 +1,103 @@
+"""
+checkpoint.py
+Description: Append only log of the articles matched by processor.py,
+so an interrupted run can be resumed (python3 processor.py -resume)
+without matching those articles again. Each line is a compact json
+list [kind, node, citation fields, referred links] for one article.
+"""
+import json
+import logging
+import os
+from referral_store import ReferralStore
+
+CHECKPOINT_PATH = './Saved/checkpoint.log'
+# number of articles buffered before they are written to the log
+CHECKPOINT_EVERY = 1000
+
+
+class CheckpointLog:
+    """
+    Records each matched article with add(). Records are buffered and
+    appended to the log at path every `every` articles, on flush() and
+    on close(). A new log is started unless append is True.
+    Can be used as a context manager.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, append=False, every=CHECKPOINT_EVERY):
+        self.path = path
+        self.every = every
+        self.num_records = 0
+        self._buffer = []
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as log:
+                log.seek(-1, os.SEEK_END)
+                torn = log.read(1) != b'\n'
+        else:
+            torn = False
+        self._file = open(path, 'a' if append else 'w')
+        if torn:
+            # end the line a break cut off, so it is the only broken one
+            self._file.write('\n')
+
+    def add(self, kind, node, fields, links):
+        """
+        Records that the article node of the kind ('domain' or 'twitter')
+        data was matched, with the list of its citation field values
+        and the links it refers to.
+        """
+        self._buffer.append(json.dumps([kind, node, fields, links],
+                                       separators=(',', ':')) + '\n')
+        if len(self._buffer) >= self.every:
+            self.flush()
+
+    def flush(self):
+        """Appends the buffered records to the log."""
+        if self._buffer:
+            self._file.write(''.join(self._buffer))
+            self.num_records += len(self._buffer)
+            self._buffer = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def replay(data, fields, path=CHECKPOINT_PATH):
+    """
+    Applies the records of the log at path to data, a dict of kind
+    to the data dictionary of that kind: the citation fields (named by
+    fields) of each recorded article are set and it is marked completed.
+    Records of articles not in data and a torn last line are skipped.
+    Returns a dict of kind to a ReferralStore of the recorded referrals.
+    """
+    referrals = {kind: ReferralStore() for kind in data}
+    if not os.path.exists(path):
+        return referrals
+    num_replayed = 0
+    with open(path) as log:
+        for line in log:
+            try:
+                kind, node, values, links = json.loads(line)
+            except ValueError:
+                logging.warning('Skipped a broken line of ' + path)
+                continue
+            article = data.get(kind, {}).get(node)
+            if article is None:
+                continue
+            article.update(zip(fields, values))
+            article['completed'] = True
+            for link in links:
+                referrals[kind].add(link, article['id'])
+            num_replayed += 1
+    logging.info('Replayed ' + str(num_replayed) + ' articles from ' + path)
+    return referrals
@@ -0,0 +1,57 @@
+"""
+ids.py
+Description: Id generation shared by the processor. Ids are the
+uuid5 of a url or name in the DNS namespace, the same value as
+str(uuid.uuid5(uuid.NAMESPACE_DNS, name)) but computed without
+building a UUID object for each name. The ids and parsed parts of
+urls are memoized in bounded caches shared by every place that
+creates nodes, since the same urls and handles come up again and again.
+"""
+import hashlib
+import uuid
+from functools import lru_cache
+from urllib.parse import urlparse
+
+_DNS_SHA1 = hashlib.sha1(uuid.NAMESPACE_DNS.bytes)
+# number of names and urls kept in each memo cache
+ID_CACHE_SIZE = 1 << 18
+
+
+def uuid5_id(name):
+    """Returns str(uuid.uuid5(uuid.NAMESPACE_DNS, name))."""
+    sha1 = _DNS_SHA1.copy()
+    sha1.update(name.encode('utf-8'))
+    digest = bytearray(sha1.digest()[:16])
+    digest[6] = (digest[6] & 0x0f) | 0x50  # version 5
+    digest[8] = (digest[8] & 0x3f) | 0x80  # RFC 4122 variant
+    h = digest.hex()
+    return h[:8] + '-' + h[8:12] + '-' + h[12:16] + '-' + h[16:20] + '-' + h[20:]
+
+
+@lru_cache(maxsize=ID_CACHE_SIZE)
+def node_id(name):
+    """Returns uuid5_id(name), memoized."""
+    return uuid5_id(name)
+
+
+@lru_cache(maxsize=ID_CACHE_SIZE)
+def node_info(url):
+    """
+    Returns (id, domain) of the node of url, memoized. The domain is
+    url without its path, or None if url can not be parsed.
+    """
+    try:
+        path = urlparse(url).path
+    except Exception:
+        return node_id(url), None
+    return node_id(url), url.replace(path, '')
+
+
+def uuid5_ids(names):
+    """Returns the list of uuid5 ids of names, in the same order.
+    Each distinct name is hashed once, through the node_id cache."""
+    ids = {}
+    for name in names:
+        if name not in ids:
+            ids[name] = node_id(name)
+    return [ids[name] for name in names]
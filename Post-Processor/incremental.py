@@ -0,0 +1,163 @@
+"""
+incremental.py
+Description: The state kept between incremental runs of processor.py
+(python3 processor.py -incremental). It holds a manifest of the crawler
+output files that have been processed, with their size and modification
+time, the matched articles and tweets (without their heavy fields),
+the ids of the tweets read from each twitter file and the referral
+index, so the next run only has to match the new and changed files, and
+can drop what it had read from the changed and deleted ones.
+"""
+import json
+import logging
+import os
+from articles import HEAVY_FIELDS, ArticleRecord, read_json
+from referral_store import ReferralStore, merge_runs, write_run
+
+STATE_DIR = './Saved/incremental/'
+KINDS = ('domain', 'twitter')
+
+
+def file_signature(path):
+    """Returns [size, modification time in ns] of the file at path."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def scan_files(path, suffix):
+    """Returns a dict of file name -> file_signature for the
+    files ending with suffix in the directory path."""
+    return {file_name: file_signature(os.path.join(path, file_name))
+            for file_name in os.listdir(path) if file_name.endswith(suffix)}
+
+
+def light_record(article):
+    """Returns a copy of article without the HEAVY_FIELDS."""
+    return {key: value for key, value in article.items()
+            if key not in HEAVY_FIELDS}
+
+
+def write_json(data, path):
+    """Writes data to path as compact json, replacing the file
+    only once it has been written completely."""
+    with open(path + '.tmp', 'w') as out:
+        json.dump(data, out, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+
+class RunState:
+    """
+    The state of the last incremental run:
+        manifest: kind -> file name -> file_signature of the processed files
+        domain_data: url -> light domain ArticleRecord, read back lazily
+        twitter_data: url -> tweet ArticleRecord
+        twitter_files: twitter file name -> ids of the tweets read from it,
+                       pruned ones included (a domain file holds the
+                       article whose id is its name)
+        referrals: kind -> ReferralStore of all referrals found so far
+    """
+
+    def __init__(self):
+        self.manifest = {kind: {} for kind in KINDS}
+        self.domain_data = {}
+        self.twitter_data = {}
+        self.twitter_files = {}
+        self.referrals = {kind: ReferralStore() for kind in KINDS}
+
+    @classmethod
+    def load(cls, state_dir=STATE_DIR, domain_path='./DomainOutput/'):
+        """
+        Loads the state saved in state_dir, or returns an empty state
+        if there is none. Domain articles are ArticleRecords reading
+        their heavy fields from their file in domain_path.
+        """
+        state = cls()
+        if not os.path.exists(state_dir + 'manifest.json'):
+            return state
+        state.manifest = read_json(state_dir + 'manifest.json')
+        for url, article in read_json(state_dir + 'domain_data.json').items():
+            state.domain_data[url] = ArticleRecord(
+                article, os.path.join(domain_path, article['id'] + '.json'))
+        for url, tweet in read_json(state_dir + 'twitter_data.json').items():
+            state.twitter_data[url] = ArticleRecord(tweet)
+        state.twitter_files = read_json(state_dir + 'twitter_files.json')
+        for kind in KINDS:
+            merge_runs([state_dir + kind + '_referrals.jsonl'],
+                       state.referrals[kind])
+        logging.info('Loaded state of ' + str(len(state.domain_data)) +
+                     ' domain articles and ' + str(len(state.twitter_data)) +
+                     ' tweets')
+        return state
+
+    def save(self, state_dir=STATE_DIR):
+        """Writes the state to state_dir. The manifest is written last,
+        so after an interrupted save the next run matches the new
+        files again instead of skipping them."""
+        os.makedirs(state_dir, exist_ok=True)
+        write_json({url: light_record(article)
+                    for url, article in self.domain_data.items()},
+                   state_dir + 'domain_data.json')
+        write_json({url: dict(tweet.items())
+                    for url, tweet in self.twitter_data.items()},
+                   state_dir + 'twitter_data.json')
+        write_json(self.twitter_files, state_dir + 'twitter_files.json')
+        for kind in KINDS:
+            path = state_dir + kind + '_referrals.jsonl'
+            write_run(self.referrals[kind], path + '.tmp')
+            os.replace(path + '.tmp', path)
+        write_json(self.manifest, state_dir + 'manifest.json')
+
+    def changed_files(self, kind, files):
+        """Returns the names in files, a dict of file name -> signature,
+        that are not in the manifest or whose signature changed."""
+        known = self.manifest[kind]
+        return [file_name for file_name, signature in files.items()
+                if known.get(file_name) != signature]
+
+    def removed_files(self, kind, files):
+        """Returns the names in the manifest that are not in files."""
+        return [file_name for file_name in self.manifest[kind]
+                if file_name not in files]
+
+    def file_ids(self, kind, file_name):
+        """Returns the ids of the articles or tweets read from file_name."""
+        if kind == 'domain':
+            return [os.path.splitext(file_name)[0]]
+        return self.twitter_files.get(file_name, [])
+
+    def sort_referrals(self, files):
+        """
+        Rebuilds the referral stores so the ids of each url come in the
+        order of a full run on files (kind -> file names in the order
+        they are read): the ids of the kept articles and tweets in file
+        order, then those of the pruned ones.
+        """
+        for kind in KINDS:
+            data = self.domain_data if kind == 'domain' else self.twitter_data
+            kept = {article['id'] for article in data.values()}
+            ids = [article_id for file_name in files[kind]
+                   for article_id in self.file_ids(kind, file_name)]
+            referrals = ReferralStore()
+            referrals.reserve_ids([article_id for article_id in ids if article_id in kept] +
+                                  [article_id for article_id in ids if article_id not in kept])
+            referrals.update(self.referrals[kind])
+            self.referrals[kind] = referrals
+
+    def drop(self, kind, file_names):
+        """
+        Drops the articles or tweets read from file_names and their
+        referrals, e.g. before the files are read again.
+        Returns the ids of the dropped articles, the urls of the dropped
+        records and the urls that lost a referral.
+        """
+        data = self.domain_data if kind == 'domain' else self.twitter_data
+        ids = set()
+        for file_name in file_names:
+            ids.update(self.file_ids(kind, file_name))
+            self.twitter_files.pop(file_name, None)
+        if not ids:
+            return ids, [], []
+        urls = [url for url, article in data.items() if article['id'] in ids]
+        for url in urls:
+            del data[url]
+        return ids, urls, self.referrals[kind].remove_ids(ids)
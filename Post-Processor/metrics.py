@@ -0,0 +1,139 @@
+"""
+metrics.py
+Description: Counters and per stage timers of a processor run. Stages
+count the items they process and report their progress, with the rate
+and the estimated time left, at most every PROGRESS_INTERVAL seconds
+instead of logging every item. The numbers of a run are written to
+Output/run_metrics.json at the end.
+"""
+import json
+import logging
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+METRICS_PATH = 'Output/run_metrics.json'
+# seconds between two progress reports of a stage
+PROGRESS_INTERVAL = 10
+
+
+def format_seconds(seconds):
+    """Returns seconds as h:mm:ss."""
+    seconds = int(seconds)
+    return str(seconds // 3600) + ':' + str(seconds // 60 % 60).zfill(2) + \
+        ':' + str(seconds % 60).zfill(2)
+
+
+class Stage:
+    """
+    Time and number of items of one stage (e.g. 'match_domain').
+    A stage can be started and stopped several times, the time and
+    items of each part are added up.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.items = 0
+        # seconds a process of a pool stage waited for work
+        self.idle_seconds = 0.0
+        self.total = None
+        self._start = None
+        self._start_items = 0
+        self._last_report = 0.0
+
+    def start(self, total=None):
+        """Starts timing the stage, total is the number of items
+        expected in this part if known, for the ETA."""
+        self.total = total
+        self._start = self._last_report = timer()
+        self._start_items = self.items
+        return self
+
+    def stop(self):
+        if self._start is not None:
+            self.seconds += timer() - self._start
+            self._start = None
+
+    def add(self, items=1):
+        """Counts items processed and reports the progress if the last
+        report is more than PROGRESS_INTERVAL seconds old."""
+        self.items += items
+        if self._start is not None and timer() - self._last_report >= PROGRESS_INTERVAL:  # nopep8
+            self.report()
+
+    def report(self):
+        """Logs and prints the progress, rate and ETA of the stage."""
+        now = timer()
+        self._last_report = now
+        done = self.items - self._start_items
+        rate = done / max(now - self._start, 1e-9)
+        message = self.name + ': ' + str(done)
+        if self.total:
+            message += '/' + str(self.total)
+        message += ' items, ' + str(int(rate)) + ' items/sec'
+        if self.total and rate > 0:
+            message += ', ETA ' + format_seconds((self.total - done) / rate)
+        logging.info(message)
+        print(message)
+
+    def to_dict(self):
+        stage = {'seconds': round(self.seconds, 3), 'items': self.items,
+                 'items_per_sec': round(self.items / self.seconds, 1)
+                 if self.seconds > 0 else None}
+        if self.idle_seconds:
+            stage['idle_seconds'] = round(self.idle_seconds, 3)
+        return stage
+
+
+class Metrics:
+    """The stages and counters of a run, by name."""
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._start = timer()
+
+    def get_stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = Stage(name)
+        return self.stages[name]
+
+    def start(self, name, total=None):
+        """Starts and returns the stage name."""
+        return self.get_stage(name).start(total)
+
+    @contextmanager
+    def stage(self, name, total=None):
+        """Times the block as a part of the stage name, which it yields."""
+        stage = self.start(name, total)
+        try:
+            yield stage
+        finally:
+            stage.stop()
+
+    def record(self, name, seconds, items=0, idle_seconds=0.0):
+        """Adds seconds, items and idle_seconds measured elsewhere
+        to the stage name."""
+        stage = self.get_stage(name)
+        stage.seconds += seconds
+        stage.items += items
+        stage.idle_seconds += idle_seconds
+
+    def count(self, name, value=1):
+        """Adds value to the counter name."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        return {'total_seconds': round(timer() - self._start, 3),
+                'stages': {name: stage.to_dict() for name, stage in self.stages.items()},  # nopep8
+                'counters': self.counters}
+
+    def write(self, path=METRICS_PATH):
+        """Writes the metrics to path as json and logs a summary."""
+        metrics = self.to_dict()
+        with open(path, 'w') as out:
+            json.dump(metrics, out, indent=4)
+        for name, stage in metrics['stages'].items():
+            logging.info(name + ': ' + str(stage['seconds']) + ' seconds, ' +
+                         str(stage['items']) + ' items')
+        return metrics
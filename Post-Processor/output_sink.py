@@ -0,0 +1,270 @@
+"""
+output_sink.py
+Description: Writers for the rows of the processor output. A sink is
+opened once per run, buffers the rows it is given and writes them to
+its file in large blocks. Rows produced in pool processes are kept in
+a ListSink and returned to the process that writes them.
+The rows can also be written as a parquet file with list columns
+if pyarrow is installed, and as an excel workbook with XlsxSink.
+"""
+import csv
+from timeit import default_timer as timer
+from openpyxl import Workbook
+try:
+    # optional, for the parquet output
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# the columns of Output/output.csv, in order
+OUTPUT_COLUMNS = (
+    'id',
+    'url',
+    'referring record id',
+    'number of referrals',
+    'type',
+    'associated publisher',
+    'tags',
+    'name',
+    'authors',
+    'date of publication',
+    'plain text',
+    'citation url or text alias',
+    'citation name',
+    'anchor text',
+    'article title'
+)
+# number of rows buffered before they are written
+BUFFER_ROWS = 10000
+# columns of the parquet output holding lists and integers,
+# all other columns are strings
+LIST_COLUMNS = ('referring record id', 'tags', 'citation url or text alias',
+                'citation name', 'anchor text')
+INT_COLUMNS = ('number of referrals',)
+# rows of an excel sheet, including the title row
+EXCEL_MAX_ROWS = 1048576
+
+
+class BufferedSink:
+    """
+    Base class of the sinks. Rows are buffered and handed to
+    _write_block buffer_rows at a time, and the rest on flush() or close().
+    seconds is the time spent writing the blocks and closing the sink.
+    Can be used as a context manager.
+    """
+
+    def __init__(self, buffer_rows=BUFFER_ROWS):
+        self.buffer_rows = buffer_rows
+        self.num_rows = 0
+        self.seconds = 0.0
+        self.closed = False
+        self._buffer = []
+
+    def write(self, row):
+        """Adds row, a tuple with a value for each of the OUTPUT_COLUMNS."""
+        self._buffer.append(row)
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+
+    def write_rows(self, rows):
+        """Adds each row of rows."""
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        """Writes the buffered rows."""
+        if self._buffer:
+            start = timer()
+            self._write_block(self._buffer)
+            self.seconds += timer() - start
+            self.num_rows += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+            start = timer()
+            self._close()
+            self.seconds += timer() - start
+            self.closed = True
+
+    def _write_block(self, rows):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class OutputSink(BufferedSink):
+    """
+    Writes rows with the OUTPUT_COLUMNS to the csv file at path,
+    the title row is written when the sink is opened.
+    """
+
+    def __init__(self, path='Output/output.csv', buffer_rows=BUFFER_ROWS, mode='a'):
+        super().__init__(buffer_rows)
+        self.path = path
+        self._file = open(path, mode, newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(OUTPUT_COLUMNS)
+
+    def _write_block(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+def to_list(value):
+    """Returns value as a list of strings for a list column."""
+    if isinstance(value, (list, tuple, set)):
+        return [str(item) for item in value]
+    if value is None or value == '':
+        return []
+    return [str(value)]
+
+
+def to_str(value):
+    """Returns value as a string (or None) for a string column."""
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+def parquet_schema():
+    """Returns the pyarrow schema of the parquet output."""
+    fields = []
+    for column in OUTPUT_COLUMNS:
+        if column in LIST_COLUMNS:
+            fields.append(pa.field(column, pa.list_(pa.string())))
+        elif column in INT_COLUMNS:
+            fields.append(pa.field(column, pa.int64()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+class ParquetSink(BufferedSink):
+    """
+    Writes rows with the OUTPUT_COLUMNS to the parquet file at path,
+    one row group per block of rows. The LIST_COLUMNS are written as
+    lists of strings instead of their python repr. Needs pyarrow.
+    """
+
+    def __init__(self, path='Output/output.parquet', buffer_rows=BUFFER_ROWS):
+        if pa is None:
+            raise ImportError('pyarrow is needed for the parquet output')
+        super().__init__(buffer_rows)
+        self.path = path
+        self.schema = parquet_schema()
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def _write_block(self, rows):
+        columns = {}
+        for i, column in enumerate(OUTPUT_COLUMNS):
+            if column in LIST_COLUMNS:
+                columns[column] = [to_list(row[i]) for row in rows]
+            elif column in INT_COLUMNS:
+                columns[column] = [row[i] for row in rows]
+            else:
+                columns[column] = [to_str(row[i]) for row in rows]
+        self._writer.write_table(
+            pa.Table.from_pydict(columns, schema=self.schema))
+
+    def _close(self):
+        self._writer.close()
+
+
+def excel_cell(value):
+    """
+    Returns value as it is written to the workbook: strings (and the
+    str() of lists, as in output.csv) are unicode_escape encoded,
+    empty values are left blank.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    return str(value).encode('unicode_escape').decode('utf-8')
+
+
+class XlsxSink(BufferedSink):
+    """
+    Writes rows with the OUTPUT_COLUMNS to the excel workbook at path
+    with a write only workbook, so rows are streamed to disk as they
+    come. Like the DataFrame.to_excel export it replaces, the first
+    column is the row number and each cell goes through excel_cell.
+    A new sheet is started when a sheet reaches EXCEL_MAX_ROWS.
+    The workbook is saved on close().
+    """
+
+    def __init__(self, path='Output/output.xlsx', buffer_rows=BUFFER_ROWS,
+                 max_rows=EXCEL_MAX_ROWS):
+        super().__init__(buffer_rows)
+        self.path = path
+        self.max_rows = max_rows
+        self.num_sheets = 0
+        self._workbook = Workbook(write_only=True)
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.num_sheets += 1
+        self._sheet = self._workbook.create_sheet('Sheet' + str(self.num_sheets))
+        self._sheet.append((None,) + OUTPUT_COLUMNS)
+        self._sheet_rows = 1
+
+    def _write_block(self, rows):
+        for i, row in enumerate(rows, self.num_rows):
+            if self._sheet_rows >= self.max_rows:
+                self._new_sheet()
+            self._sheet.append([i] + [excel_cell(value) for value in row])
+            self._sheet_rows += 1
+
+    def _close(self):
+        self._workbook.save(self.path)
+
+
+class TeeSink(BufferedSink):
+    """
+    Writes every row to each of sinks, which buffer them on their own.
+    If a set ids is given, the id (first column) of each row is added to it.
+    """
+
+    def __init__(self, sinks, ids=None):
+        super().__init__()
+        self.sinks = list(sinks)
+        self.ids = ids
+
+    def write(self, row):
+        for sink in self.sinks:
+            sink.write(row)
+        if self.ids is not None:
+            self.ids.add(row[0])
+        self.num_rows += 1
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def _close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class ListSink(BufferedSink):
+    """Keeps the rows in the list rows, e.g. to return them from a pool process."""
+
+    def __init__(self, buffer_rows=BUFFER_ROWS):
+        super().__init__(buffer_rows)
+        self.rows = []
+
+    def _write_block(self, rows):
+        self.rows.extend(rows)
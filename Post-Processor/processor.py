@@ -11,117 +11,226 @@ Output: link_title_list.json
 """
 import pandas as pd
 from operator import delitem
-import tldextract
 import json
 import os
-import re
 import csv
-import ast
 import itertools
-import uuid
 from timeit import default_timer as timer
 import logging
 import sys
 import gc
-from multiprocessing import Process, Manager
-from urllib.parse import urlparse
-logging.basicConfig(filename='./logs/processor.log', level=logging.DEBUG, filemode='w')  # nopep8
+import time
+from functools import partial
+import multiprocessing
+from scope_index import ScopeIndex, split_url
+from articles import ArticleRecord, iter_domain_files, parse_mentions, parse_str_list
+from ids import node_id, node_info, uuid5_ids
+from referral_store import ReferralStore, merge_runs, write_run
+from output_sink import ListSink, OutputSink, ParquetSink, TeeSink, XlsxSink, pa
+from incremental import RunState, scan_files
+from checkpoint import CheckpointLog, replay
+from sqlite_store import SQLITE_PATH, SqliteStore
+from urls import canonical_url
+from metrics import Metrics
+from scheduler import WorkerTimes, article_cost, cost_chunks
+from prune import LoadFilter, iso_date
+logging.basicConfig(filename='./logs/processor.log', level=logging.INFO, filemode='w')  # nopep8
 NUM_PROCS = -1
 MEM_LIMIT = -1
+LAZY_LOAD = False
+# write Output/output.xlsx without Output/output.csv
+XLSX_ONLY = False
+# only process the files that are new since the last incremental run
+INCREMENTAL = False
+# resume an interrupted run from the checkpoint log
+RESUME = False
+# keep the data in an SQLite database instead of in memory
+SQLITE = False
+# skip the articles that can not reach the output when loading them
+PRUNE = False
+# with PRUNE, the YYYY-MM-DD dates of the articles to keep and a comma
+# separated list of the crawl scope domains to keep (set by -since=,
+# -until= and -domains=, each of them switches PRUNE on)
+SINCE = None
+UNTIL = None
+DOMAINS = None
+# number of articles sent to a worker process at a time
+POOL_BATCH_SIZE = 100
+# number of nodes in a batch of the cross matching pool
+OUTPUT_BATCH_SIZE = 1000
+# the fields find_*_citation_aliases add to an article
+CITATION_FIELDS = ('citation url or text alias', 'citation name', 'anchor text')
+# stage timers and counters of the run, written to Output/run_metrics.json
+METRICS = Metrics()
+# command line flags and the global each of them switches on
+FLAGS = {'-lazy': 'LAZY_LOAD', '-xlsx_only': 'XLSX_ONLY',
+         '-incremental': 'INCREMENTAL', '-resume': 'RESUME', '-sqlite': 'SQLITE',
+         '-prune': 'PRUNE'}
+# command line options with a value and the global they set
+VALUE_OPTIONS = {'-since': 'SINCE', '-until': 'UNTIL', '-domains': 'DOMAINS'}
+
+
+def iter_domain_articles(lazy=False, num_procs=1, errors=None, file_names=None):
+    """Yields each article of the domain output json files in
+    ./DomainOutput/ (or only its file_names) as an ArticleRecord, ready
+    to be processed. See load_json for lazy and num_procs, files that
+    can not be parsed are appended to errors."""
+    # used to parse domain files in a folder called results
+    path_to_json = './DomainOutput/'
+    stage = METRICS.start('load_domain', len(file_names) if file_names is not None else None)  # nopep8
+    try:
+        for path, data in iter_domain_files(path_to_json, num_procs, lazy, errors, file_names):  # nopep8
+            data = ArticleRecord(data, path if lazy else None)
+            data['completed'] = False
+            data["type"] = "article"
+            data["language"] = ""
+            stage.add()
+            yield data
+    finally:
+        stage.stop()
 
 
-def load_json():
+def load_json(lazy=False, num_procs=1, file_names=None, load_filter=None,
+              pruned_referrals=None):
     """Loads the domain output json from
-    folder ./DomainOutput/ into a dictionary.
+    folder ./DomainOutput/ into a dictionary, or only
+    the given file_names of the folder.
+    If lazy is True, only a light record of each article is kept
+    and html_content and article_text are read from disk when used.
+    If num_procs > 1 the files are parsed by that many processes.
+    Files that can not be parsed are logged and skipped.
+    If a LoadFilter is given, only the articles it keeps are loaded and
+    the links of the others are added to the ReferralStore pruned_referrals.
     Returns domain data dict and a dict of
     domain id to url and domain pairings."""
-    # used to parse domain files in a folder called results
     logging.info("Loading domain files")
-    path_to_json = './DomainOutput/'
     all_data = {}
     pairings = {}
-    for file_name in [file for file in os.listdir(path_to_json) if file.endswith('.json')]:  # nopep8
-        file_size = os.path.getsize(path_to_json + file_name)
-        with open(path_to_json + file_name) as json_file:
-            data = json.load(json_file)
-            data['id'] = os.path.splitext(file_name)[0]
-            data['completed'] = False
-            data["type"] = "article"
-            data["language"] = ""
-            all_data[data['url']] = data
-            pairings[data['id']] = {'url': data['url'], 'domain': data['domain']}  # nopep8
+    errors = []
+    articles = iter_domain_articles(lazy, num_procs, errors, file_names)
+    if load_filter is not None:
+        articles = load_filter.filter('domain', articles, pruned_referrals.add)
+    for data in articles:
+        all_data[data['url']] = data
+        pairings[data['id']] = {'url': data['url'], 'domain': data['domain']}  # nopep8
+    if errors:
+        print('could not load', len(errors), 'domain files, see logs')
+        METRICS.count('domain_load_errors', len(errors))
+    logging.info("Loaded " + str(len(all_data)) + " domain files, " +
+                 str(len(errors)) + " failed")
+    if load_filter is not None:
+        METRICS.count('pruned_domain', load_filter.pruned['domain'])
     return all_data, pairings
 
 
-def convert_dict(original):
-    key_dict = {'tags': 'Hashtags', 'tweet_url': 'url', 'twitter_handle': 'Source', 'place': 'geo', 'text': 'Plain Text of Article or Tweet', 'created_at': 'Date',
-                'lang': 'Language'}
-    new_dict = {}
-    for key in original:
-        if key in key_dict:
-            new_dict[key_dict[key]] = original[key]
-        else:
-            new_dict[key] = original[key]
-    new_dict['Type'] = 'Twitter Hanlde'
-    new_dict['Associated Publisher'] = ''
-    new_dict['Authors'] = ''
-    return new_dict
+# twitter csv columns and the names the processor uses for them
+TWITTER_COLUMNS = {'tags': 'Hashtags', 'tweet_url': 'url', 'twitter_handle': 'Source', 'place': 'geo', 'text': 'Plain Text of Article or Tweet', 'created_at': 'Date',
+                   'lang': 'Language'}
+# number of twitter csv rows parsed at a time
+TWITTER_CHUNK_SIZE = 50000
 
 
-def load_twitter_csv():
+def iter_twitter_articles(file_names=None):
+    '''Yields each tweet of the twitter output csv files in
+    folder ./TwitterOutput/ (or only its file_names).
+    The csv files are read in chunks of TWITTER_CHUNK_SIZE rows
+    and built column by column. Files without a tweet_url (or url)
+    column are logged and skipped, the other columns may be missing.'''
+    path = './TwitterOutput/'
+    if file_names is None:
+        file_names = [file for file in os.listdir(path) if file.endswith('.csv')]  # nopep8
+    stage = METRICS.start('load_twitter')
+    try:
+        for file_name in file_names:
+            logging.info(file_name)
+            chunks = pd.read_csv(path + file_name, encoding='utf-8-sig', dtype=str,
+                                 keep_default_na=False, chunksize=TWITTER_CHUNK_SIZE)
+            for chunk in chunks:
+                chunk = chunk.rename(columns=TWITTER_COLUMNS)
+                if 'url' not in chunk.columns:
+                    # every tweet would get the same '' url and id
+                    print('could not load', file_name, 'without a tweet_url column, see logs')  # nopep8
+                    logging.warning('Skipped ' + file_name + ': no tweet_url or url column')  # nopep8
+                    METRICS.count('twitter_load_errors')
+                    chunks.close()
+                    break
+
+                def column(name):
+                    if name in chunk.columns:
+                        return chunk[name].tolist()
+                    return [''] * len(chunk)
+
+                urls = column('url')
+                sources = column('Source')
+                ids = uuid5_ids(urls)
+                mentions = [parse_mentions(value)
+                            for value in column('entities')]
+                found_urls = []
+                for url, value in zip(urls, column('citation_urls')):
+                    try:
+                        found_urls.append(parse_str_list(value))
+                    except(Exception):
+                        print("Missing urls for twitter.csv", url)
+                        METRICS.count('twitter_missing_urls')
+                        found_urls.append([])
+
+                for row in zip(urls, ids, sources, column('Hashtags'), column('Language'),
+                               column('Plain Text of Article or Tweet'), column('Date'),
+                               mentions, found_urls):
+                    url, uid, source = row[0], row[1], row[2]
+                    yield {
+                        'url': url,
+                        'id': uid,     # this is the unique id assinged by post_processor, not the twitter id
+                        'domain': source,
+                        'type': "twitter",
+                        'Tags': row[3],
+                        "language": row[4],
+                        'Associated Publisher': '',
+                        'author_metascraper': '',
+                        'article_text': row[5],
+                        'date': row[6],
+                        'Mentions': row[7],
+                        'found_urls': row[8],
+                        'title_metascraper': '',
+                        'completed': False}
+                stage.add(len(chunk))
+    finally:
+        stage.stop()
+
+
+def load_twitter_csv(file_names=None, load_filter=None, pruned_referrals=None):
     '''Loads the twitter output csv from
-    folder ./TwitterOutput/ into a dictionary
+    folder ./TwitterOutput/ into a dictionary of ArticleRecords,
+    or only the given file_names of the folder.
+    If a LoadFilter is given, only the tweets it keeps are loaded and
+    the links of the others are added to the ReferralStore pruned_referrals.
     Returns twitter data dict and a dict of
     twitter id to url and domain pairings.'''
     logging.info("Loading twitter files")
     data = {}
     pairings = {}
-    path = './TwitterOutput/'
-    for file_name in [file for file in os.listdir(path) if file.endswith('.csv')]:  # nopep8
-        logging.info(file_name)
-        with open(path + file_name, mode='r', encoding='utf-8-sig') as csv_file:  # nopep8
-            for line in csv.DictReader(csv_file):
-                line = convert_dict(line)
-                try:
-                    entities = ast.literal_eval(line['entities'])
-                except(Exception):
-                    # print("Missing entities for twitter.csv", line['url'])
-                    entities = {}
-
-                try:
-                    found_urls = ast.literal_eval(line['citation_urls'])
-                except(Exception):
-                    print("Missing urls for twitter.csv", line['url'])
-                    found_urls = []
-
-                Mentions = []
-                if ('mentions' in entities.keys()):
-                    for mention in entities['mentions']:
-                        Mentions.append(mention['username'])
-                uid = str(uuid.uuid5(uuid.NAMESPACE_DNS, line['url']))
-
-                data[line['url']] = {
-                    'url': line['url'],
-                    'id': uid,     # this is the unique id assinged by post_processor, not the twitter id
-                    'domain': line['Source'],
-                    'type': "twitter",
-                    'Tags': line['Hashtags'],
-                    "language": line['Language'],
-                    'Associated Publisher': line['Associated Publisher'],
-                    'author_metascraper': line['Authors'],
-                    'article_text': line['Plain Text of Article or Tweet'],
-                    'date': line['Date'],
-                    'Mentions': Mentions,
-                    'found_urls': found_urls,
-                    'title_metascraper': '',
-                    'completed': False}
-
-                pairings[uid] = {'url': line['url'],
-                                 'twitter_handle': line['Source']}
-        csv_file.close()
+    tweets = iter_twitter_articles(file_names)
+    if load_filter is not None:
+        tweets = load_filter.filter('twitter', tweets, pruned_referrals.add)
+    for tweet in tweets:
+        tweet = ArticleRecord(tweet)
+        data[tweet['url']] = tweet
+        pairings[tweet['id']] = {'url': tweet['url'],
+                                 'twitter_handle': tweet['domain']}
+    if load_filter is not None:
+        METRICS.count('pruned_twitter', load_filter.pruned['twitter'])
     return data, pairings
 
 
+def make_load_filter(crawl_scope):
+    """Returns the LoadFilter of the PRUNE, SINCE, UNTIL and DOMAINS
+    options, or None if pruning is not switched on."""
+    if not (PRUNE or SINCE or UNTIL or DOMAINS):
+        return None
+    domains = set(DOMAINS.split(',')) if DOMAINS else None
+    return LoadFilter(crawl_scope, SINCE, UNTIL, domains)
+
+
 def load_scope(file):
     """
     Loads the scope csv into a dictionary.
@@ -153,8 +262,7 @@ def load_scope(file):
             try:
                 source = line['Source']
             except(Exception):
-                source = str(uuid.uuid5(
-                    uuid.NAMESPACE_DNS, line['Name']))
+                source = node_id(line['Name'])
             scope[source] = {'Name': line['Name'] if 'Name' in line.keys() else '',
                                     #  'RSS': line['RSS feed URLs (where available)'],  # nopep8
                                      'Type': line['Type'] if 'type' in line.keys() else '',
@@ -174,7 +282,7 @@ def find_domain_citation_aliases(data, node, scope):
     Parameters:
         data: the data dictionary
         node: the node in the dictionary that we are searching on
-        scope: the scope dictionary
+        scope: the ScopeIndex of the scope
     Returns 1 lists:
         - found aliases is a list of all
             the sources that this article node refers to
@@ -186,124 +294,97 @@ def find_domain_citation_aliases(data, node, scope):
     anchor_text = []
 
     sequence = data[node]['html_content']
-    for source, info in scope.items():
-
-        if 'http' in source:
-            # find the in-scope citation url in html_content
-            ext_node = tldextract.extract(data[node]['domain'])
-            ext = tldextract.extract(source)
+    ext_node = scope.extract(data[node]['domain'])
+    # find the in-scope citation urls in html_content, parsing each link once
+    anchors_by_source = scope.find_anchor_citations(
+        sequence, ext_node, data[node]['url'])
+    # find in-scope aliases and twitter handles in html_content in one pass
+    found_by_source = scope.matcher.found_by_source(sequence)
+    found_sources = set(anchors_by_source) | set(found_by_source)
+    for source in sorted(found_sources, key=scope.position.get):
+        # skip recursive citation
+        if scope.is_recursive(source, ext_node):
+            continue
+        info = scope[source]
+
+        for citation_url, text in anchors_by_source.get(source, []):
+            # sometime non english article list hyperlink multiple times for a single citation
+            # check duplicate here
+            if citation_url not in citation_url_or_text_alias:
+                citation_url_or_text_alias.append(citation_url)
+                anchor_text.append(text)
+                citation_name.append(info["Name"])
+            if source not in found_aliases:
+                found_aliases.append(source)
 
-            # skip recursive citation
-            if (ext_node == ext):
-                continue
+        # in-scope aliases and twitter_handles found in html_content
+        for alias in found_by_source.get(source, []):
+            citation_url_or_text_alias.append(alias)
+            citation_name.append(info["Name"])
+            if source not in found_aliases:
+                found_aliases.append(source)
 
-            if ext[0] == '':
-                domain = ext[1] + '.' + ext[2]
-            else:
-                domain = '.'.join(ext)
-            pattern = r"<a\s+href=([\"'])(http://www.|http://|https://www.|https://)" + \
-                re.escape(domain) + r"/(.*?)([\"'])(.*?)(>)(.*?)(</a>)"
-            matches = re.findall(pattern, sequence, re.IGNORECASE)
-            if matches:
-                for match in matches:
-                    citation_url = match[1] + domain + '/' + match[2]
-                    # sometime non english article list hyperlink multiple times for a single citation
-                    # check duplicate here
-                    if citation_url not in citation_url_or_text_alias:
-                        citation_url_or_text_alias.append(citation_url)
-                        anchor_text.append(match[6])
-                        citation_name.append(info["Name"])
-                    if source not in found_aliases:
-                        found_aliases.append(source)
-
-        # find in-scope aliases in html_content
-        if info['aliases']:
-            aliases = info['aliases']
-            for i in range(0, len(aliases)):
-                pattern = r"( |\"|')" + re.escape(aliases[i]) + r"( |\"|'|,)"
-                if re.search(pattern, sequence, re.IGNORECASE):
-                    citation_url_or_text_alias.append(aliases[i])
-                    citation_name.append(info["Name"])
-                    if source not in found_aliases:
-                        found_aliases.append(source)
-
-        # find twitter_handles in html_content
-        if info['twitter_handles']:
-            handles = info['twitter_handles']
-            for i in range(0, len(handles)):
-                pattern = r"@" + re.escape(handles[i])
-                if re.search(pattern, sequence, re.IGNORECASE):
-                    citation_url_or_text_alias.append(handles[i])
-                    citation_name.append(info['Name'])
-                    if source not in found_aliases:
-                        found_aliases.append(source)
-
-        data[node]['citation url or text alias'] = citation_url_or_text_alias
-        data[node]['citation name'] = citation_name
-        data[node]['anchor text'] = anchor_text
+    data[node]['citation url or text alias'] = citation_url_or_text_alias
+    data[node]['citation name'] = citation_name
+    data[node]['anchor text'] = anchor_text
 
     return found_aliases
 
 
 def find_twitter_citation_aliases(data, node, scope):
+    '''
+    Finds all the in scope urls, mentions and text aliases of this tweet.
+    Append keys 'citation url or text alias', 'citation name', and 'anchor text' to the node.
+    Parameters:
+        data: the data dictionary
+        node: the node in the dictionary that we are searching on
+        scope: the ScopeIndex of the scope
+    Returns a list of all the sources that this tweet refers to.
+    '''
     found_aliases = []
     citation_url_or_text_alias = []
     citation_name = []
 
-    node_twitter_handle = data[node]['domain']
-
-    for source, info in scope.items():
-
-        # skip recursive citation
-
-        for i in range(0, len(info['twitter_handles'])):
-            if (info['twitter_handles'][i].replace('@', '').strip().lower() == node_twitter_handle.replace('@', '').strip().lower()):
-                continue
-
+    # source -> (urls of its domain, urls of its twitter handles,
+    # its handles mentioned in the tweet)
+    hits = {}
+    for url in data[node]['found_urls']:
+        host, url_handle = split_url(url)
         # find all url with domain matching scope
-        if 'http' in source:
-            ext = tldextract.extract(source)
-
-            if ext[0] == '':
-                domain = ext[1] + '.' + ext[2] + '/'
-            else:
-                domain = '.'.join(ext) + '/'
-
-            for url in data[node]['found_urls']:
-                if domain in url:
-                    citation_url_or_text_alias.append(url)
-                    citation_name.append(info['Name'])
-                    if source not in found_aliases:
-                        found_aliases.append(source)
-
-        for url in data[node]['found_urls']:
-            for twitter_handle in info['twitter_handles']:
-                twitter_url = 'https://twitter.com/' + \
-                    twitter_handle.replace('@', '') + '/'
-                if twitter_url in url and (url not in citation_url_or_text_alias):
-                    citation_url_or_text_alias.append(url)
-                    citation_name.append(info['Name'])
-                    if source not in found_aliases:
-                        found_aliases.append(source)
-
-        # find all matching mentions of the tweet
-        for mention in data[node]['Mentions']:
-            for twitter_handle in info['twitter_handles']:
-                if twitter_handle.replace('@', '').lower() == mention.lower():
-                    citation_url_or_text_alias.append(twitter_handle)
-                    citation_name.append(info['Name'])
-                    if source not in found_aliases:
-                        found_aliases.append(source)
-
-        # find all matching text aliases of the tweet text
-        aliases = info['aliases']
-        for i in range(0, len(aliases)):
-            pattern = r"( |\"|')" + re.escape(aliases[i]) + r"( |\"|'|,)"
-            if re.search(pattern, data[node]['article_text'], re.IGNORECASE) and (aliases[i] not in citation_url_or_text_alias):
-                citation_url_or_text_alias.append(aliases[i])
+        for source in scope.sources_for_host(host):
+            hits.setdefault(source, ([], [], []))[0].append(url)
+        # find all url of a twitter handle in scope
+        for source, _ in scope.handle_to_sources.get(url_handle, ()):
+            hits.setdefault(source, ([], [], []))[1].append(url)
+    # find all matching mentions of the tweet
+    for mention in data[node]['Mentions']:
+        for source, twitter_handle in scope.handle_to_sources.get(mention.lower(), ()):  # nopep8
+            hits.setdefault(source, ([], [], []))[2].append(twitter_handle)
+    # find all matching text aliases of the tweet text
+    aliases_by_source = scope.matcher.found_by_source(
+        data[node]['article_text'], with_handles=False)
+
+    found_sources = set(hits) | set(aliases_by_source)
+    for source in sorted(found_sources, key=scope.position.get):
+        info = scope[source]
+        domain_urls, twitter_urls, handles = hits.get(source, ([], [], []))
+        num_citations = len(citation_url_or_text_alias)
+        for url in domain_urls:
+            citation_url_or_text_alias.append(url)
+            citation_name.append(info['Name'])
+        for url in twitter_urls:
+            if url not in citation_url_or_text_alias:
+                citation_url_or_text_alias.append(url)
+                citation_name.append(info['Name'])
+        for twitter_handle in handles:
+            citation_url_or_text_alias.append(twitter_handle)
+            citation_name.append(info['Name'])
+        for alias in aliases_by_source.get(source, []):
+            if alias not in citation_url_or_text_alias:
+                citation_url_or_text_alias.append(alias)
                 citation_name.append(info["Name"])
-                if source not in found_aliases:
-                    found_aliases.append(source)
+        if len(citation_url_or_text_alias) > num_citations:
+            found_aliases.append(source)
 
     data[node]['citation url or text alias'] = citation_url_or_text_alias
     data[node]['citation name'] = citation_name
@@ -312,22 +393,23 @@ def find_twitter_citation_aliases(data, node, scope):
     return found_aliases
 
 
-def process_twitter(data, scope):
+def process_twitter(data, scope, checkpoint=None):
     """
     Processes the twitter data by finding all the articles
     that are referring to it and mutating the output dictionary.
     Parameters:
         data: the twitter output dictionary
-        scope: the scope dictionary
-    Returns 2 dicts, one for the mutated data dictionary,
-    and another dict of referrals.
+        scope: the ScopeIndex of the scope
+        checkpoint: a CheckpointLog each processed tweet is added to
+    Returns the mutated data dictionary and a ReferralStore of referrals.
     """
     logging.info("Processing Twitter")
+    stage = METRICS.start('match_twitter', len(data))
     try:
-        start = timer()
-        referrals = {}
-        num_processed = 0
-        number_of_articles = len(data)
+        referrals = ReferralStore()
+        # the referring ids of each url come in data order, also those of
+        # the completed articles merged in after (see reserve_ids)
+        referrals.reserve_ids(data[node]['id'] for node in data)
         for node in data:
             if data[node]['completed']:
                 continue
@@ -336,128 +418,48 @@ def process_twitter(data, scope):
             # each key in links is an article url, and it has a list
             # of article ids that are talking about it
             for link in data[node]['found_urls']:
-                if link in referrals:
-                    referrals[link].append(data[node]['id'])
-                else:
-                    referrals[link] = [data[node]['id']]
+                referrals.add(link, data[node]['id'])
             # looks for sources in found aliases, and adds it to the linking
             for source in found_aliases:
-                if source in referrals:
-                    referrals[source].append(data[node]['id'])
-                else:
-                    referrals[source] = [data[node]['id']]
+                referrals.add(source, data[node]['id'])
 
             data[node]['completed'] = True
-            num_processed += 1
-            logging.info("Processed " + str(num_processed) + "/" + str(number_of_articles) + " twitter articles")  # nopep8
-        end = timer()
-        logging.info("Finished processing twitter - Took " + str(end - start) + " seconds")  # nopep8
+            if checkpoint is not None:
+                checkpoint.add('twitter', node, [data[node][key] for key in CITATION_FIELDS],  # nopep8
+                               list(data[node]['found_urls']) + found_aliases)
+            stage.add()
+        stage.stop()
+        logging.info("Finished processing twitter - Took " + str(stage.seconds) + " seconds")  # nopep8
     except Exception:
-        logging.warning('Exception at Processing Twitter, data written to Saved/')  # nopep8
+        stage.stop()
+        logging.warning('Exception at Processing Twitter, processed tweets are in the checkpoint log')  # nopep8
         exc_type, exc_value, exc_traceback = sys.exc_info()
         logging.error(exc_value)
         logging.error(exc_type)
-        write_to_file(referrals, "Saved/twitter_referrals.json")
-        write_to_file(data, "Saved/twitter_data.json")
         raise
+    record_prefilter(scope.matcher.take_stats())
     return data, referrals
 
 
-def multi_process_twitter(data, scope, assignemnts, referrals_shared=None):
-    """
-    Processes the twitter data using multi-processing by finding all the articles
-    that are referring to it and mutating the output dictionary.
-    Parameters:
-        data: the twitter output dictionary
-        scope: the scope dictionary
-    Returns 2 dicts, one for the mutated data dictionary,
-    and another dict of referrals.
-    """
-    logging.info("Processing Twitter")
-    try:
-        start = timer()
-        referrals = {}
-        num_processed = 0
-        threshold = MEM_LIMIT
-        number_of_articles = len(assignemnts)  # len(data)
-        for node in assignemnts:  # data:
-            if data[node]['completed']:
-                continue
-            found_aliases, twitter_handles = find_twitter_citation_aliases(
-                data, node, scope)
-            # each key in links is an article url, and it has a list
-            # of article ids that are talking about it
-            for link in data[node]['found_urls']:
-                if link in referrals:
-                    referrals[link].append(data[node]['id'])
-                    # referrals[link].update([data[node]['id']])
-                    # periodically clear duplicates to save memory
-                    if num_processed > 0 and num_processed % 5000 == 0:
-                        referrals[link] = list(dict.fromkeys(referrals[link]))
-                else:
-                    referrals[link] = list(dict.fromkeys([data[node]['id']]))
-                    #referrals[link] = set(data[node]['id'])
-            # looks for sources in found aliases, and adds it to the linking
-            for source in found_aliases:
-                if source in referrals:
-                    referrals[source].append(data[node]['id'])
-                    # periodically clear duplicates to save memory
-                    if num_processed > 0 and num_processed % 5000 == 0:
-                        referrals[source] = list(
-                            dict.fromkeys(referrals[source]))
-                    # referrals[source].update([data[node]['id']])
-                else:
-                    referrals[source] = list(dict.fromkeys([data[node]['id']]))
-                    #referrals[source] = set(data[node]['id'])
-
-            data[node]['completed'] = True
-            num_processed += 1
-            if threshold > -1 and sys.getsizeof(referrals) > threshold:
-                filename = './tempFiles/Twitter/twitter_referrals_' + \
-                    str(os.getpid()) + '_' + str(num_processed) + '.json'
-                with open(filename, 'w') as out:
-                    out.write(json.dumps(referrals))
-                    referrals.clear()
-                    logging.info('Created file ' + filename)
-            logging.info(str(os.getpid()) + ":Processed " + str(num_processed) + "/" + str(number_of_articles) + " twitter articles")  # nopep8
-        if threshold > -1:
-            final_filename = './tempFiles/Twitter/twitter_referrals_' + \
-                str(os.getpid()) + '_final.json'
-            with open(final_filename, 'w') as final:
-                final.write(json.dumps(referrals))
-        else:
-            referrals_shared.update(referrals)
-        end = timer()
-        logging.info("Finished processing twitter - Took " + str(end - start) + " seconds")  # nopep8
-    except Exception:
-        logging.warning('Exception at Processing Twitter, data written to Saved/')  # nopep8
-        exc_type, exc_value, exc_traceback = sys.exc_info()
-        logging.error(exc_value)
-        logging.error(exc_type)
-        write_to_file(referrals, "Saved/twitter_referrals.json")
-        write_to_file(data, "Saved/twitter_data.json")
-        raise
-    return data, referrals
-
-
-def process_domain(data, scope):
+def process_domain(data, scope, checkpoint=None):
     """
     Processes the domain data by finding all the articles that it is
     referring to and articles that are referring to it and mutating
     the output dictionary.
     Parameters:
         data: the domain output dictionary
-        scope: the scope dictionary
+        scope: the ScopeIndex of the scope
+        checkpoint: a CheckpointLog each processed article is added to
     Return:
-        Returns 2 dicts, one for the mutated data dictionary,
-        and another dict of referrals.
+        Returns the mutated data dictionary and a ReferralStore of referrals.
     """
     logging.info("Processing Domain")
+    stage = METRICS.start('match_domain', len(data))
     try:
-        start = timer()
-        referrals = {}
-        num_processed = 0
-        number_of_articles = len(data)
+        referrals = ReferralStore()
+        # the referring ids of each url come in data order, also those of
+        # the completed articles merged in after (see reserve_ids)
+        referrals.reserve_ids(data[node]['id'] for node in data)
         for node in data:
             if data[node]['completed']:
                 continue
@@ -468,153 +470,265 @@ def process_domain(data, scope):
                 # save all referrals where each key is
                 # each link in 'found_urls'
                 # and the value is this article's id
-                if link['url'] in referrals:
-                    referrals[link['url']].append(data[node]['id'])
-                else:
-                    referrals[link['url']] = [data[node]['id']]
+                referrals.add(link['url'], data[node]['id'])
 
             # looks for sources in found aliases, and adds it to the linking
             for source in found_aliases:
-                if source in referrals:
-                    referrals[source].append(data[node]['id'])
-                else:
-                    referrals[source] = [data[node]['id']]
+                referrals.add(source, data[node]['id'])
 
             data[node]['completed'] = True
-            num_processed += 1
-
-            logging.info("Processed " + str(num_processed) + "/" + str(number_of_articles) + " domain articles")  # nopep8
-        end = timer()
-        logging.info("Finished Processing Domain - Took " + str(end - start) + " seconds")  # nopep8
+            if checkpoint is not None:
+                checkpoint.add('domain', node, [data[node][key] for key in CITATION_FIELDS],  # nopep8
+                               [link['url'] for link in data[node]['found_urls']] + found_aliases)  # nopep8
+            stage.add()
+        stage.stop()
+        logging.info("Finished Processing Domain - Took " + str(stage.seconds) + " seconds")  # nopep8
     except Exception:
-        logging.warning('Exception at Processing Domain, data written to Saved/')  # nopep8
+        stage.stop()
+        logging.warning('Exception at Processing Domain, processed articles are in the checkpoint log')  # nopep8
         exc_type, exc_value, exc_traceback = sys.exc_info()
         logging.error(exc_value)
         logging.error(exc_type)
-        write_to_file(referrals, "Saved/domain_referrals.json")
-        write_to_file(data, "Saved/domain_data.json")
         raise
+    record_prefilter(scope.matcher.take_stats())
     return data, referrals
 
 
-def multi_process_domain(data, domain_data_dicts, scope, assignments, referrals_shared=None):
+# state of a match_batch worker, set by init_worker when the pool starts.
+# Pools fork (see frozen_pool), so the data is shared with the parent
+# until it is written to.
+worker_state = {}
+
+
+def record_prefilter(stats):
+    """Adds the prefilter stats of an AliasMatcher to the METRICS counters."""
+    for name, value in stats.items():
+        METRICS.count('prefilter_' + name, value)
+
+
+def report_prefilter():
+    """Logs and prints the share of the documents and aliases the
+    prefilter of the AliasMatcher rejected before matching them."""
+    documents = METRICS.counters.get('prefilter_documents', 0)
+    if not documents:
+        return
+    rejected = METRICS.counters.get('prefilter_rejected', 0)
+    message = 'Prefilter rejected ' + str(rejected) + ' of ' + str(documents) + \
+        ' documents (' + str(round(100.0 * rejected / documents, 1)) + '%), ' + \
+        str(round(METRICS.counters.get('prefilter_candidate_keys', 0) / documents, 2)) + \
+        ' candidate aliases per document'
+    logging.info(message)
+    print(message)
+
+
+def frozen_pool(initializer, initargs):
     """
-    Processes the domain data using multi processing by finding all the articles that it is
-    referring to and articles that are referring to it and mutating
-    the output dictionary.
+    Returns a Pool of NUM_PROCS processes started with initializer and
+    initargs. The objects loaded so far are moved to the permanent
+    generation of the garbage collector before the processes are forked
+    (gc.freeze, Python 3.7+), so collections in the processes do not
+    write to the memory pages of the data they were forked with, and
+    those pages stay shared instead of being copied to each process.
+    Call thaw() once the pool is closed.
+    The processes are always forked, whatever the default start method
+    is: they get the data and worker_state from the parent's memory
+    instead of pickling it (see can_fork).
+    """
+    if hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+    context = multiprocessing.get_context('fork')
+    return context.Pool(NUM_PROCS, initializer=initializer, initargs=initargs)
+
+
+def can_fork():
+    """Returns True if processes can be forked on this platform,
+    which the pools of frozen_pool need."""
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def thaw():
+    """Lets the garbage collector collect the objects frozen by frozen_pool."""
+    if hasattr(gc, 'unfreeze'):
+        gc.unfreeze()
+
+
+def init_worker(domain_data, twitter_data, scope):
+    """Initializer of the match_batch pool processes."""
+    worker_state['domain'] = domain_data
+    worker_state['twitter'] = twitter_data
+    worker_state['scope'] = scope
+
+
+def match_batch(task):
+    """
+    Pool worker: finds the citations of a batch of articles.
     Parameters:
-        data: the domain output dictionary
-        scope: the scope dictionary
-    Return:
-        Returns 2 dicts, one for the mutated data dictionary,
-        and another dict of referrals.
+        task: a tuple of the kind of the articles ('domain' or 'twitter')
+              and the list of their keys in the data the pool was started with
+    Returns the process id, the seconds the batch took, a list of
+    (node, citation fields, referred links), one per article, where the
+    links are the found urls and found sources of the article, and the
+    prefilter stats of the batch. Only these are sent back to the parent,
+    not the article.
     """
-    logging.info("Processing Domain")
-    try:
-        start = timer()
-        referrals = {}
-        num_processed = 0
-        threshold = MEM_LIMIT
-        number_of_articles = len(assignments)  # len(data)
-        for node in assignments:  # data:
-            if data[node]['completed']:
-                continue
-            found_aliases = find_domain_citation_aliases(data, node, scope)
-            domain_data_dicts[node] = data[node]
-            # each key in links is an article url, and it has a list of
-            # article ids that are referring it
-            for link in data[node]['found_urls']:
-                # save all referrals where each key is
-                # each link in 'found_urls'
-                # and the value is this article's id
-                if link['url'] in referrals:
-                    referrals[link['url']].append(data[node]['id'])
-                    # periodically clear duplicates to save memory
-                    if num_processed > 0 and num_processed % 5000 == 0:
-                        print('removing duplicates')
-                        referrals[link['url']] = list(
-                            dict.fromkeys(referrals[link['url']]))
-                else:
-                    referrals[link['url']] = list(
-                        dict.fromkeys([data[node]['id']]))
+    start = timer()
+    kind, nodes = task
+    scope = worker_state['scope']
+    results = match_nodes(kind, worker_state[kind], nodes, scope)
+    return os.getpid(), timer() - start, results, scope.matcher.take_stats()
 
-            # looks for sources in found aliases, and adds it to the linking
-            for source in found_aliases:
-                if source in referrals:
-                    referrals[source].append(data[node]['id'])
-                    # periodically clear duplicates to save memory
-                    if num_processed > 0 and num_processed % 5000 == 0:
-                        print('removing duplicates')
-                        referrals[source] = list(
-                            dict.fromkeys(referrals[source]))
-                else:
-                    referrals[source] = list(dict.fromkeys([data[node]['id']]))
 
-            data[node]['completed'] = True
-            num_processed += 1
-            if threshold > -1 and sys.getsizeof(referrals) > threshold:
-                filename = './tempFiles/Domain/domain_referrals_' + \
-                    str(os.getpid()) + '_' + str(num_processed) + '.json'
-                with open(filename, 'w') as out:
-                    out.write(json.dumps(referrals))
-                    referrals.clear()
-                    logging.info('Created file ' + filename)
-            logging.info(str(os.getpid()) + ": Processed " + str(num_processed) + "/" + str(number_of_articles) + " domain articles")  # nopep8
-        # referrals_shared.update(referrals)
-        if threshold > -1:
-            final_filename = './tempFiles/Domain/domain_referrals_' + \
-                str(os.getpid()) + '_final.json'
-            with open(final_filename, 'w') as final:
-                final.write(json.dumps(referrals))
+def match_articles(task):
+    """
+    Pool worker: like match_batch, for a batch of articles sent with the
+    task instead of the data the pool was started with.
+    Parameters:
+        task: a tuple of the kind of the articles ('domain' or 'twitter')
+              and the list of the articles, as stored by the SqliteStore
+    The nodes of the results are the urls of the articles.
+    """
+    start = timer()
+    kind, articles = task
+    data = sqlite_records(kind, articles)
+    scope = worker_state['scope']
+    results = match_nodes(kind, data, list(data), scope)
+    return os.getpid(), timer() - start, results, scope.matcher.take_stats()
+
+
+def match_nodes(kind, data, nodes, scope):
+    """
+    Finds the citations of the articles nodes of data, of the kind
+    'domain' or 'twitter'. Returns a list of (node, citation fields,
+    referred links), one per article, where the links are the found
+    urls and found sources of the article.
+    """
+    results = []
+    for node in nodes:
+        if kind == 'domain':
+            found_aliases = find_domain_citation_aliases(data, node, scope)
+            links = [link['url'] for link in data[node]['found_urls']]
         else:
-            referrals_shared.update(referrals)
-        end = timer()
-        logging.info("Finished Processing Domain - Took " + str(end - start) + " seconds")  # nopep8
-        logging.info('Process ' + str(os.getpid()) +
-                     ' processed ' + str(num_processed) + ' articles')
+            found_aliases = find_twitter_citation_aliases(data, node, scope)
+            links = list(data[node]['found_urls'])
+        fields = {key: data[node][key] for key in CITATION_FIELDS}
+        results.append((node, fields, links + found_aliases))
+    return results
+
+
+def record_workers(workers, wall_seconds):
+    """Records the busy and idle time of the processes of a pool,
+    a WorkerTimes, in METRICS as match_worker_<n>."""
+    for number, worker in enumerate(workers.report(wall_seconds), 1):
+        METRICS.record('match_worker_' + str(number), worker['busy_seconds'],
+                       worker['items'], worker['idle_seconds'])
+
+
+def spill_referrals(referrals, temp_dir, kind, runs):
+    """
+    Writes referrals to temp_dir as a sorted run, clears them and
+    appends the name of the run to runs.
+    """
+    run = kind + '_referrals_' + str(os.getpid()) + '_' + str(len(runs)) + '.jsonl'  # nopep8
+    write_run(referrals, temp_dir + run)
+    referrals.clear()
+    runs.append(run)
+    METRICS.count('spilled_runs')
+
+
+def multi_process(domain_data, twitter_data, scope, checkpoint=None):
+    """
+    Processes the domain and twitter data on a pool of NUM_PROCS processes.
+    The articles are sent to the workers as chunks of up to POOL_BATCH_SIZE
+    keys of about even estimated cost (see scheduler.py), the busy and
+    idle time of each worker is recorded in METRICS, and the citation
+    fields and referrals the workers return are applied to the data
+    here. If MEM_LIMIT is set, referrals are written to
+    ./tempFiles/ as key sorted runs whenever their size in bytes grows
+    past it, and the runs are merged back with a k-way merge at the end.
+    Parameters:
+        domain_data: the domain output dictionary
+        twitter_data: the twitter output dictionary
+        scope: the ScopeIndex of the scope
+        checkpoint: a CheckpointLog each processed article is added to
+    Returns the mutated data dictionaries and a ReferralStore of
+    referrals for each of them.
+    """
+    logging.info("Processing Domain and Twitter with " + str(NUM_PROCS) + " processes")  # nopep8
+    start = timer()
+    stages = {}
+    data = {'domain': domain_data, 'twitter': twitter_data}
+    referrals = {'domain': ReferralStore(), 'twitter': ReferralStore()}
+    temp_dirs = {'domain': './tempFiles/Domain/',
+                 'twitter': './tempFiles/Twitter/'}
+    runs = {'domain': [], 'twitter': []}
+    tasks = []
+    totals = {}
+    order = {}
+    for kind in ['domain', 'twitter']:
+        nodes = [node for node in data[kind] if not data[kind][node]['completed']]  # nopep8
+        totals[kind] = len(nodes)
+        # the chunks are matched by cost, the referring ids of each url
+        # keep the data order of a run with a single process
+        order[kind] = [article['id'] for article in data[kind].values()]
+        referrals[kind].reserve_ids(order[kind])
+        costs = [article_cost(data[kind][node]) for node in nodes]
+        for chunk in cost_chunks(nodes, costs, NUM_PROCS, POOL_BATCH_SIZE):
+            tasks.append((kind, chunk))
+    workers = WorkerTimes()
+    pool_start = timer()
+    try:
+        with frozen_pool(init_worker, (domain_data, twitter_data, scope)) as pool:
+            # each process takes the next chunk as soon as it is done
+            for (kind, _), (pid, seconds, results, stats) in zip(tasks, pool.imap(match_batch, tasks)):  # nopep8
+                workers.add(pid, seconds, len(results))
+                record_prefilter(stats)
+                # the domain batches come first, then the twitter batches
+                if kind not in stages:
+                    for stage in stages.values():
+                        stage.stop()
+                    stages[kind] = METRICS.start('match_' + kind, totals[kind])
+                for node, fields, links in results:
+                    article = data[kind][node]
+                    article.update(fields)
+                    article['completed'] = True
+                    for link in links:
+                        referrals[kind].add(link, article['id'])
+                    if checkpoint is not None:
+                        checkpoint.add(kind, node, [fields[key] for key in CITATION_FIELDS], links)  # nopep8
+                if MEM_LIMIT > -1 and sys.getsizeof(referrals[kind]) > MEM_LIMIT:
+                    spill_referrals(referrals[kind], temp_dirs[kind], kind, runs[kind])  # nopep8
+                stages[kind].add(len(results))
     except Exception:
-        logging.warning('Exception at Processing Domain, data written to Saved/')  # nopep8
+        logging.warning('Exception at Processing, processed articles are in the checkpoint log')  # nopep8
         exc_type, exc_value, exc_traceback = sys.exc_info()
         logging.error(exc_value)
         logging.error(exc_type)
-        write_to_file(referrals, "Saved/domain_referrals.json")
-        write_to_file(data, "Saved/domain_data.json")
         raise
-
-    return data, referrals
+    finally:
+        thaw()
+        for stage in stages.values():
+            stage.stop()
+    record_workers(workers, timer() - pool_start)
+    for kind in runs:
+        if runs[kind]:  # merge from disk files
+            spill_referrals(referrals[kind], temp_dirs[kind], kind, runs[kind])
+            referrals[kind].reserve_ids(order[kind])
+            mergeFiles(temp_dirs[kind], referrals[kind], runs[kind])
+            for run in runs[kind]:
+                os.remove(temp_dirs[kind] + run)
+    end = timer()
+    logging.info("Finished processing with " + str(NUM_PROCS) + " processes - Took " + str(end - start) + " seconds")  # nopep8
+    return domain_data, referrals['domain'], twitter_data, referrals['twitter']
 
 
-def create_csv_title():
-    row = (
-        'id',
-        'url',
-        'referring record id',
-        'number of referrals',
-        'type',
-        'associated publisher',
-        'tags',
-        'name',
-        'authors',
-        'date of publication',
-        'plain text',
-        'citation url or text alias',
-        'citation name',
-        'anchor text',
-        'article title'
-    )
-    with open('Output/output.csv', 'a') as new_file:
-        csv_writer = csv.writer(new_file)
-        csv_writer.writerow(row)
-
-    new_file.close()
-
-
-def create_output(article, referrals, crawl_scope, output, interest_output, domain_pairs, twitter_pairs, domains, domain_to_url, final_pairs):
+def create_output(article, referrals, crawl_scope, output, interest_output, domain_pairs, twitter_pairs, final_pairs, sink):
     """
     create an row for all URLs in DomainOutput that contain citations or text alias from citation scope in output.csv
+    The row is written to sink, the OutputSink opened by process_crawler.
     """
     # check if URL in DomainOutput
-    if (article["id"] in domain_pairs.keys() and article["domain"] in crawl_scope.keys()) or (article['id'] in twitter_pairs.keys()):
+    if (article["id"] in domain_pairs.keys() and article["domain"] in crawl_scope) or (article['id'] in twitter_pairs.keys()):
         # check if it contains citations or text alias from citation scope
         if not 'citation url or text alias' in article.keys():
             return
@@ -631,18 +745,9 @@ def create_output(article, referrals, crawl_scope, output, interest_output, doma
             # does not include these static nodes
             # in output if referral count is 0.
             return
-        try:
-            publisher = crawl_scope[article["domain"]]['Publisher']
-        except Exception:
-            publisher = ""
-        try:
-            tags = crawl_scope[article["domain"]]['Tags']
-        except Exception:
-            tags = ""
-        try:
-            name = crawl_scope[article["domain"]]['Name']
-        except Exception:
-            name = ""
+        publisher = crawl_scope.info(article["domain"], 'Publisher')
+        tags = crawl_scope.info(article["domain"], 'Tags')
+        name = crawl_scope.info(article["domain"], 'Name')
 
         row = (
             article['id'],
@@ -661,12 +766,7 @@ def create_output(article, referrals, crawl_scope, output, interest_output, doma
             article['anchor text'],
             article['title_metascraper']
         )
-
-        with open('Output/output.csv', 'a') as new_file:
-            csv_writer = csv.writer(new_file)
-            csv_writer.writerow(row)
-
-        new_file.close()
+        sink.write(row)
 
 
 def parse_referrals(article, domain_referrals, twitter_referrals):
@@ -699,48 +799,27 @@ def parse_referrals(article, domain_referrals, twitter_referrals):
 
 def merge_referals(source, dest):
     """
-    Merge the source into dest 
+    Merge the source, a ReferralStore or dict of referrals,
+    into dest, a ReferralStore
     """
-    ref_start = timer()
-    c = 0
-    for link in source:
-        if link in dest:
-            # dest[link].append(source[link])
-            dest[link] += source[link]
-        else:
-            dest[link] = source[link].copy()
-        c += 1
-        logging.info('Merged ' + str(c) + '/' +
-                     str(len(source)) + ' referrals')
-    ref_end = timer()
-    logging.info('Merged referrals in ' +
-                 str(ref_end - ref_start) + ' seconds')
+    with METRICS.stage('merge') as stage:
+        dest.update(source)
+        stage.add(len(source))
 
 
-def mergeFiles(pathToFiles, destDict):
+def mergeFiles(pathToFiles, destDict, files=None):
     """
-    Merges all JSONs in pathToFiles into a single dictionary
+    Merges the sorted referral runs (.jsonl files written by write_run)
+    in pathToFiles into destDict with a streaming k-way merge
     Parameters:
-        pathToFiles: the path to the directory of JSONs that will be merged
-        destDict: the destination dictionary where the results will be stored
+        pathToFiles: the path to the directory of runs that will be merged
+        destDict: the destination ReferralStore where the results will be stored
+        files: the names of the runs to merge, all runs in pathToFiles if None
     """
-    files = os.listdir(pathToFiles)
-    file_start = timer()
-    count = 0
-    for f in files:
-        with open(pathToFiles + f, 'r') as readFile:
-            tmp = json.loads(readFile.read())
-            for key in tmp:
-                if key in destDict:
-                    destDict[key] += tmp[key]
-                    destDict[key] = list(dict.fromkeys(destDict[key]))
-                else:
-                    destDict[key] = list(dict.fromkeys(tmp[key]))
-        count += 1
-        logging.info(f + ': Merged ' + str(count) +
-                     '/' + str(len(files)) + ' files')
-    file_end = timer()
-    logging.info('Merged files in ' + str(file_end - file_start) + ' seconds')
+    if files is None:
+        files = [f for f in os.listdir(pathToFiles) if f.endswith('.jsonl')]
+    with METRICS.stage('merge') as stage:
+        stage.add(merge_runs([pathToFiles + f for f in files], destDict))
 
 
 def generateNode(url, result):
@@ -751,127 +830,95 @@ def generateNode(url, result):
         result: a dictionary to store the URL-node pair
     """
     # domain = tldextract.extract(url)[1]#urlparse(url).netloc
-    try:
-        path = urlparse(url).path
-    except Exception:
-        return
     if url == None:
         return
-    domain = url.replace(path, '')
-    result[url] = {'id': str(uuid.uuid5(uuid.NAMESPACE_DNS, url)), 'type': 'domain', 'domain': domain,
+    uid, domain = node_info(url)
+    if domain is None:
+        return
+    result[url] = {'id': uid, 'type': 'domain', 'domain': domain,
                    'url': url, 'article_text': '', 'date': '', 'author_metadata': '', 'language': ''}
 
 
+def open_output_sinks(output_dir='Output/', ids=None):
+    """
+    Opens the sinks of the output rows: output.csv (unless XLSX_ONLY
+    is set), output.xlsx and, if pyarrow is installed, output.parquet
+    in output_dir. Returns a TeeSink over them, which adds the id of
+    each row to the set ids if it is given.
+    """
+    sinks = [XlsxSink(output_dir + 'output.xlsx')]
+    if not XLSX_ONLY:
+        sinks.insert(0, OutputSink(output_dir + 'output.csv'))
+    if pa is not None:
+        sinks.append(ParquetSink(output_dir + 'output.parquet'))
+    else:
+        logging.info('pyarrow is not installed, not writing output.parquet')
+    return TeeSink(sinks, ids)
+
+
 def process_crawler(domain_data, twitter_data, crawl_scope, citation_scope, domain_pairs,
                     twitter_pairs, saved_domain_referrals={},
-                    saved_twitter_referrals={}):
+                    saved_twitter_referrals={}, checkpoint=None):
     """
     The main point of entry for the processor.
     Calls the domain and twitter processor seperately.
     Parameters:
         domain_data: domain dictionary
         twitter_data: twitter dictionary
-        scope: scope dictionary
+        crawl_scope: ScopeIndex of the crawl scope
+        citation_scope: ScopeIndex of the citation scope
         domain_pairs: domain dictionary mapping article id to url
         twitter_pairs: twitter dictionary mapping tweet id to url
-        saved_domain_referrals: A dictionary of saved domain referrals,
-                                with mapping of url to id.
-        saved_twitter_referrals: A dictionary of saved twitter referrals,
-                                with mapping of url to id.
+        saved_domain_referrals: the domain referrals of the completed
+                                articles replayed from the checkpoint log
+        saved_twitter_referrals: the twitter referrals of the completed
+                                tweets replayed from the checkpoint log
+        checkpoint: a CheckpointLog the processed articles are added to
 
     Outputs the post processing data into output.json and interest_output.json.
     """
-    output = {}
-    interest_output = {}
     # get a dictionary of all the referrals for each source
+    domain_data, domain_referrals, twitter_data, twitter_referrals = (
+        match_data(domain_data, twitter_data, citation_scope, checkpoint))
+    # merge saved referrals and newly found referrals, the ids of the
+    # completed articles are already reserved in data order
+    domain_referrals.update(saved_domain_referrals)
+    twitter_referrals.update(saved_twitter_referrals)
+    if checkpoint is not None:
+        checkpoint.flush()
+    write_output(domain_data, twitter_data, domain_referrals, twitter_referrals,
+                 crawl_scope, citation_scope, domain_pairs, twitter_pairs)
+
+
+def match_data(domain_data, twitter_data, citation_scope, checkpoint=None):
+    """
+    Finds the citations of the articles of domain_data and twitter_data
+    that are not completed yet, on NUM_PROCS processes if it is set.
+    Each processed article is added to checkpoint, if it is given.
+    Returns the mutated data dictionaries and a ReferralStore of
+    referrals for each of them.
+    """
     if NUM_PROCS == -1 and MEM_LIMIT == -1:  # run normally w/o multiprocessing
         domain_data, domain_referrals = (
-            process_domain(domain_data, citation_scope))
+            process_domain(domain_data, citation_scope, checkpoint))
         twitter_data, twitter_referrals = (
-            process_twitter(twitter_data, citation_scope))
+            process_twitter(twitter_data, citation_scope, checkpoint))
     elif NUM_PROCS > 0:  # multiprocessing
-        num_procs = NUM_PROCS
-        ##### INITIALIZE DOMAIN PROCESSES #####
-        managerDomain = Manager()
-        domain_referrals = {}
-        domain_dicts = [None] * num_procs
-        assignments = {k: [] for k in range(num_procs)}
-        process_index = 0
-        domain_procs = [None] * num_procs
-        for node in domain_data:
-            assignments[process_index % num_procs].append(node)
-            process_index += 1
-        if MEM_LIMIT == -1:  # initialize shared dictionaries to store results in memory
-            for proc in range(num_procs):
-                domain_dicts[proc] = managerDomain.dict()
-
-        # initailize domain_data_dicts as a shared dict to store modified domain data
-        domain_data_dicts = managerDomain.dict()
-
-        for proc in range(num_procs):
-            domain_procs[proc] = Process(target=multi_process_domain, args=(
-                domain_data, domain_data_dicts, citation_scope, assignments[proc], domain_dicts[proc], ))
-            domain_procs[proc].start()
-
-        ##### INITIALIZE TWITTER PROCESSES #####
-        managerTwitter = Manager()
-        twitter_referrals = {}
-        assignmentsTwitter = {k: [] for k in range(num_procs)}
-        process_index = 0
-        twit_dicts = [None] * num_procs
-        if MEM_LIMIT == -1:  # initialize shared dictionaries to store results in memory
-            for proc in range(num_procs):
-                twit_dicts = managerTwitter.dict()
-        for node in twitter_data:
-            assignmentsTwitter[process_index % num_procs].append(node)
-            process_index += 1
-        twit_procs = [None] * num_procs
-        for h in range(num_procs):
-            twit_procs[h] = Process(target=multi_process_twitter, args=(
-                twitter_data, citation_scope, assignmentsTwitter[h], twit_procs[proc], ))
-            twit_procs[h].start()
-
-        ##### JOIN DOMAIN PROCESSES #####
-        for proc in range(num_procs):
-            domain_procs[proc].join()
-            if MEM_LIMIT == -1:  # merge from memory
-                merge_referals(domain_dicts[proc], domain_referrals)
-        # update domain_data after multi_process_domain
-        domain_data = domain_data_dicts.copy()
-
-        if MEM_LIMIT > 0:  # merge from disk files
-            mergeFiles('./tempFiles/Domain/', domain_referrals)
-        twitter_referrals = {}
-        ##### JOIN TWITTER PROCESSES #####
-        for p in range(num_procs):
-            twit_procs[p].join()
-            if MEM_LIMIT == -1:  # merge from memory
-                merge_referals(twit_dicts[proc], twitter_referrals)
-        if MEM_LIMIT > 0:  # merge from disk files
-            mergeFiles('./tempFiles/Twitter/', twitter_referrals)
-
-    # save referrals to file in case of break
-    write_to_file(domain_data, "Saved/domain_data.json")
-    write_to_file(domain_referrals, "Saved/domain_referrals.json")
-    """
-    if saved_domain_referrals != {}:
-        # merge saved referrals and newly found referrals
-        new = {key: value + saved_domain_referrals[key] for key, value in domain_referrals.items()}  # nopep8
-        saved_domain_referrals.update(new)
-        domain_referrals = saved_domain_referrals
-        write_to_file(domain_referrals, "Saved/domain_referrals.json")
-    """
-    # save referrals to file in case of break
-    write_to_file(twitter_data, "Saved/twitter_data.json")
-    write_to_file(twitter_referrals, "Saved/twitter_referrals.json")
+        domain_data, domain_referrals, twitter_data, twitter_referrals = (
+            multi_process(domain_data, twitter_data, citation_scope, checkpoint))
+
+    return domain_data, domain_referrals, twitter_data, twitter_referrals
+
+
+def write_output(domain_data, twitter_data, domain_referrals, twitter_referrals,
+                 crawl_scope, citation_scope, domain_pairs, twitter_pairs,
+                 affected=None, output_dir='Output/', written_ids=None):
     """
-    if saved_twitter_referrals != {}:
-        print('merging saved and newly found referrals')
-        # merge saved referrals and newly found referrals
-        new = {key: value + saved_twitter_referrals[key] for key, value in twitter_referrals.items()}  # nopep8
-        saved_twitter_referrals.update(new)
-        twitter_referrals = saved_twitter_referrals
-        write_to_file(twitter_referrals, "Saved/twitter_referrals.json")
+    Cross-matches the referrals and writes a row for each article
+    in the output (see create_output) to the sinks in output_dir.
+    If affected is given, only the nodes whose canonical url is in it
+    are written. The ids of the rows are added to the set written_ids
+    if it is given.
     """
     # create static nodes
 
@@ -881,70 +928,367 @@ def process_crawler(domain_data, twitter_data, crawl_scope, citation_scope, doma
     nodes.update(domain_data)
     domain_data = nodes
 
-    start = timer()
+    stage = METRICS.start('cross_match')
     # cross match between domain and twitter data and
-    # create the output dictionary
+    # create the output rows
     print('cross match between domain and twitter data ')
 
-    domains = []
-    domain_to_url = {}
-    id_to_tweet = {}
-    create_csv_title()
-
-    for url in citation_scope.keys():
-        if not url.startswith('@'):
-            curr_dom = tldextract.extract(url)[1]
-            domains.append(curr_dom)
-            domain_to_url[curr_dom] = url
-    # create output for articles found in 'found_urls' of twitter data
-    twitter_urls = {}
-    for link in twitter_referrals:
-        if link in twitter_data or link in domain_data:
-            continue
-        generateNode(link, twitter_urls)
-    for val in twitter_urls:
-        referring_articles = parse_referrals(
-            twitter_urls[val], domain_referrals, twitter_referrals)
-        create_output(twitter_urls[val], referring_articles, crawl_scope, output,
-                      interest_output, domain_pairs, twitter_pairs, domains, domain_to_url, id_to_tweet)
-
-    # create output for articles found in 'found_urls' of domain data
-    domain_urls = {}
-    for link in domain_referrals:
-        if link in domain_data or link in twitter_data:
-            continue
-        generateNode(link, domain_urls)
-    for url in domain_urls:
+    sink = open_output_sinks(output_dir, written_ids)
+    tasks = cross_match_tasks(domain_data, twitter_data, domain_referrals,
+                              twitter_referrals, affected)
+    state = {'domain': domain_data, 'twitter': twitter_data,
+             'domain_referrals': domain_referrals,
+             'twitter_referrals': twitter_referrals, 'crawl_scope': crawl_scope,
+             'domain_pairs': domain_pairs, 'twitter_pairs': twitter_pairs}
+    # compact the referrals once here, not on the first lookup of each
+    # pool process, which would write to (and copy) their memory pages
+    domain_referrals.freeze()
+    twitter_referrals.freeze()
+    if NUM_PROCS > 1:
+        # the pool processes are forked with the state, which they only read
+        try:
+            with frozen_pool(init_output_worker, (state,)) as pool:
+                for rows, num_nodes in pool.imap(cross_match_batch, tasks):
+                    sink.write_rows(rows)
+                    METRICS.count('referred_nodes', num_nodes)
+        finally:
+            thaw()
+    else:
+        for task in tasks:
+            METRICS.count('referred_nodes', cross_match(task, state, sink))
+    sink.close()
+    stage.stop()
+    stage.add(sink.num_rows)
+    record_sinks(sink, stage)
+
+
+def cross_match_tasks(domain_data, twitter_data, domain_referrals,
+                      twitter_referrals, affected=None):
+    """
+    Returns the batches of nodes to cross match, as (kind, keys) tuples
+    of up to OUTPUT_BATCH_SIZE keys, in the order of the output rows:
+        'twitter_links': referred urls of twitter_referrals without a node
+        'domain_links': referred urls of domain_referrals without a node
+        'domain' and 'twitter': the urls of the domain and twitter data
+    If affected is given, only the nodes whose canonical url is in it
+    are included.
+    """
+    # canonical urls of the nodes, the referral keys are canonical too
+    known_urls = {canonical_url(url) for url in itertools.chain(domain_data, twitter_data)}  # nopep8
+    keys = {
+        'twitter_links': [link for link in twitter_referrals if link not in known_urls and  # nopep8
+                          (affected is None or link in affected)],
+        'domain_links': [link for link in domain_referrals if link not in known_urls and  # nopep8
+                         (affected is None or link in affected)],
+        'domain': [node for node in domain_data
+                   if affected is None or canonical_url(node) in affected],
+        'twitter': [node for node in twitter_data
+                    if affected is None or canonical_url(node) in affected]}
+    tasks = []
+    for kind in ('twitter_links', 'domain_links', 'domain', 'twitter'):
+        for i in range(0, len(keys[kind]), OUTPUT_BATCH_SIZE):
+            tasks.append((kind, keys[kind][i:i + OUTPUT_BATCH_SIZE]))
+    return tasks
+
+
+def cross_match(task, state, sink):
+    """
+    Writes the output rows of a batch of cross_match_tasks to sink.
+    state holds the data, referrals, crawl scope and pairings of the
+    run under the names write_output gives them.
+    Returns the number of nodes generated for referred urls.
+    """
+    kind, keys = task
+    num_nodes = 0
+    if kind.endswith('_links'):
+        data = {}
+        for link in keys:
+            generateNode(link, data)
+        keys = list(data)
+        num_nodes = len(data)
+    else:
+        data = state[kind]
+    for key in keys:
         referring_articles = parse_referrals(
-            domain_urls[url], domain_referrals, twitter_referrals)
-        create_output(domain_urls[url], referring_articles, crawl_scope, output, interest_output,
-                      domain_pairs, twitter_pairs, domains, domain_to_url, id_to_tweet)
+            data[key], state['domain_referrals'], state['twitter_referrals'])
+        create_output(data[key], referring_articles, state['crawl_scope'], {}, {},
+                      state['domain_pairs'], state['twitter_pairs'], {}, sink)
+    return num_nodes
 
-    for node in domain_data:
-        referring_articles = parse_referrals(domain_data[node], domain_referrals, twitter_referrals)  # nopep8
-        create_output(domain_data[node], referring_articles, crawl_scope, output, interest_output, domain_pairs, twitter_pairs, domains, domain_to_url, id_to_tweet)  # nopep8
-    end = timer()
-    logging.info("Parsing domain output file - Took " + str(end - start) + " seconds")  # nopep8
 
-    start = timer()
-    print('cross match between twitter and domain data ')
-    for node in twitter_data:
-        referring_articles = parse_referrals(twitter_data[node], domain_referrals, twitter_referrals)  # nopep8
-        create_output(twitter_data[node], referring_articles, crawl_scope, output, interest_output, domain_pairs, twitter_pairs, domains, domain_to_url, id_to_tweet)  # nopep8
-    end = timer()
-    logging.info("Parsing twitter output file - Took " + str(end - start) + " seconds")  # nopep8
-    logging.info("Output " + str(len(output)) + " articles in scope and " +
-                 str(len(interest_output)) + " articles in interest scope")
-    start = timer()
-    # write_to_file(id_to_tweet, 'id_to_tweet.json')
-    # write final output to file
-    # write_to_file(output, "Output/output.json")
-    # Sorts interest output
-    # interest_output = dict(sorted(interest_output.items(), key=lambda item: item[1]['hit count'], reverse=True))  # nopep8
-    # write_to_file(interest_output, "Output/interest_output.json")
+def init_output_worker(state):
+    """Initializer of the cross_match_batch pool processes."""
+    worker_state.update(state)
 
-    end = timer()
-    logging.info("Serializing and writing final json output - Took " + str(end - start) + " seconds")  # nopep8
+
+def cross_match_batch(task):
+    """
+    Pool worker: cross matches a batch of cross_match_tasks with the
+    state the pool was started with. Returns the output rows of the
+    batch and the number of nodes generated for referred urls.
+    """
+    sink = ListSink()
+    num_nodes = cross_match(task, worker_state, sink)
+    sink.close()
+    return sink.rows, num_nodes
+
+
+def record_sinks(sink, stage):
+    """
+    Records the time spent and rows written by each sink of the TeeSink
+    sink as a 'write_<file name>' stage, and takes that time out of
+    stage, the cross matching stage that wrote to them.
+    """
+    for output_sink in sink.sinks:
+        logging.info("Wrote " + str(output_sink.num_rows) + " rows to " + output_sink.path)  # nopep8
+        METRICS.record('write_' + os.path.basename(output_sink.path),
+                       output_sink.seconds, output_sink.num_rows)
+        stage.seconds -= output_sink.seconds
+
+
+def process_incremental(crawl_scope, citation_scope):
+    """
+    Runs the processor on the crawler output files that are new or
+    changed since the last incremental run, using the RunState saved
+    in Saved/incremental/. The articles and tweets read from changed
+    or deleted files are dropped with their referrals, the new and
+    changed files are matched and their referrals are merged into the
+    saved referral index. The rows of the nodes whose articles or
+    referrals changed are written to Output/update_<date>_<time>/, where
+    they replace the rows with the same id of earlier outputs, and the
+    ids of the rows of those nodes that have none any more are written
+    to its removed_ids.csv. Without a saved state everything is
+    processed and written to Output/.
+    """
+    state = RunState.load()
+    files = {'domain': scan_files('./DomainOutput/', '.json'),
+             'twitter': scan_files('./TwitterOutput/', '.csv')}
+    new_files = {kind: state.changed_files(kind, files[kind]) for kind in files}
+    gone_files = {kind: state.removed_files(kind, files[kind]) for kind in files}
+    logging.info(str(len(new_files['domain'])) + " new domain files and " +
+                 str(len(new_files['twitter'])) + " new twitter files, " +
+                 str(len(gone_files['domain']) + len(gone_files['twitter'])) +
+                 " deleted files")
+    print('processing', len(new_files['domain']), 'new domain files and',
+          len(new_files['twitter']), 'new twitter files')
+    first_run = not state.manifest['domain'] and not state.manifest['twitter']
+    if not first_run and not any(new_files.values()) and not any(gone_files.values()):  # nopep8
+        return
+
+    # the articles and tweets of changed and deleted files are dropped
+    # with their referrals, the changed files are read again below
+    dropped_ids = set()
+    affected = set()
+    for kind in files:
+        ids, urls, keys = state.drop(kind, new_files[kind] + gone_files[kind])
+        dropped_ids.update(ids)
+        affected.update(canonical_url(url) for url in urls)
+        affected.update(keys)
+    # the referrals of the new articles pruned by the load filter
+    pruned = {'domain': ReferralStore(), 'twitter': ReferralStore()}
+    load_filter = make_load_filter(crawl_scope)
+    domain_data = state.domain_data
+    new_domain_data, _ = load_json(LAZY_LOAD, NUM_PROCS, new_files['domain'],
+                                   load_filter, pruned['domain'])
+    domain_data.update(new_domain_data)
+    twitter_data = state.twitter_data
+    new_twitter_data = {}
+    for file_name in new_files['twitter']:
+        # the ids of all the tweets of the file, the pruned ones are
+        # the ids the load filter adds to pruned['twitter']
+        num_pruned = len(pruned['twitter'].ids)
+        tweets, _ = load_twitter_csv([file_name], load_filter, pruned['twitter'])
+        state.twitter_files[file_name] = [tweet['id'] for tweet in tweets.values()] + \
+            pruned['twitter'].ids[num_pruned:]
+        new_twitter_data.update(tweets)
+    twitter_data.update(new_twitter_data)
+    domain_pairs = {article['id']: {'url': url, 'domain': article['domain']}
+                    for url, article in domain_data.items()}
+    twitter_pairs = {tweet['id']: {'url': url, 'twitter_handle': tweet['domain']}  # nopep8
+                     for url, tweet in twitter_data.items()}
+
+    # only the articles that are not completed yet are matched
+    domain_data, domain_referrals, twitter_data, twitter_referrals = (
+        match_data(domain_data, twitter_data, citation_scope))
+    domain_referrals.update(pruned['domain'])
+    twitter_referrals.update(pruned['twitter'])
+    affected.update(domain_referrals)
+    affected.update(twitter_referrals)
+    affected.update(canonical_url(url) for url in itertools.chain(new_domain_data, new_twitter_data))  # nopep8
+    state.referrals['domain'].update(domain_referrals)
+    state.referrals['twitter'].update(twitter_referrals)
+    # the saved referrals come back sorted by url, the referring ids are
+    # put back in the order of a full run
+    state.domain_data = domain_data
+    state.twitter_data = twitter_data
+    state.sort_referrals(files)
+
+    if first_run:
+        output_dir = 'Output/'
+        affected = None
+    else:
+        output_dir = 'Output/update_' + time.strftime('%Y%m%d_%H%M%S') + '/'
+        os.makedirs(output_dir)
+    written_ids = set()
+    write_output(domain_data, twitter_data, state.referrals['domain'],
+                 state.referrals['twitter'], crawl_scope, citation_scope,
+                 domain_pairs, twitter_pairs, affected, output_dir, written_ids)
+    if not first_run:
+        # the nodes that were written again, or dropped, and have no row now
+        nodes = itertools.chain(create_static_nodes(citation_scope).items(),
+                                domain_data.items(), twitter_data.items())
+        removed_ids = dropped_ids | {node['id'] for url, node in nodes
+                                     if canonical_url(url) in affected}
+        write_removed_ids(sorted(removed_ids - written_ids), output_dir)
+
+    state.manifest = files
+    state.save()
+
+
+def write_removed_ids(ids, output_dir):
+    """Writes ids to removed_ids.csv in output_dir, the ids of the rows
+    of earlier outputs that are not in the output any more."""
+    with open(output_dir + 'removed_ids.csv', 'w', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(['id'])
+        writer.writerows([removed_id] for removed_id in ids)
+    logging.info("Removed " + str(len(ids)) + " rows of earlier outputs")
+
+
+def process_sqlite(crawl_scope, citation_scope):
+    """
+    Runs the processor with its data in the SqliteStore at SQLITE_PATH
+    instead of in memory. The articles and tweets are streamed into the
+    articles and pairings tables, matched a batch at a time with the
+    batch's referrals inserted into the referrals table, and the output
+    rows are created from an indexed join of articles and referrals.
+    The database is started over unless RESUME is set, in which case
+    the articles completed by the interrupted run are not matched again.
+    """
+    if not RESUME:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(SQLITE_PATH + suffix):
+                os.remove(SQLITE_PATH + suffix)
+    with SqliteStore(SQLITE_PATH) as store:
+        load_filter = make_load_filter(crawl_scope)
+        print('loading twitter data')
+        tweets = iter_twitter_articles()
+        if load_filter is not None:
+            tweets = load_filter.filter('twitter', tweets, partial(store.add_referral, 'twitter'))  # nopep8
+        for tweet in tweets:
+            store.add_article('twitter', tweet, tweet['domain'])
+        print('loading domain data')
+        errors = []
+        articles = iter_domain_articles(True, NUM_PROCS, errors)
+        if load_filter is not None:
+            articles = load_filter.filter('domain', articles, partial(store.add_referral, 'domain'))  # nopep8
+        for article in articles:
+            store.add_article('domain', article, article['domain'])
+        store.flush()
+        if errors:
+            METRICS.count('domain_load_errors', len(errors))
+        if load_filter is not None:
+            for kind, num_pruned in load_filter.pruned.items():
+                METRICS.count('pruned_' + kind, num_pruned)
+        logging.info("Loaded " + str(store.count('domain')) + " domain articles and " +
+                     str(store.count('twitter')) + " tweets into " + SQLITE_PATH)
+
+        match_sqlite(store, citation_scope)
+
+        stage = METRICS.start('cross_match')
+        print('cross match between domain and twitter data ')
+        output = {}
+        interest_output = {}
+        id_to_tweet = {}
+        domain_pairs = store.pairings('domain')
+        twitter_pairs = store.pairings('twitter')
+        sink = open_output_sinks()
+        for kind, article, referring_articles in store.iter_referred_articles():
+            if kind == 'domain':
+                article = ArticleRecord(article, './DomainOutput/' + article['id'] + '.json')  # nopep8
+            create_output(article, referring_articles, crawl_scope, output, interest_output,
+                          domain_pairs, twitter_pairs, id_to_tweet, sink)
+        sink.close()
+        stage.stop()
+        stage.add(sink.num_rows)
+        record_sinks(sink, stage)
+
+
+def match_sqlite(store, citation_scope):
+    """
+    Matches the articles and tweets of store, a SqliteStore, that are not
+    completed, a batch at a time, and stores each batch as completed with
+    its referrals. With NUM_PROCS set, one pool matches all the batches.
+    """
+    pool = None
+    if NUM_PROCS > 0:
+        workers = WorkerTimes()
+        pool_start = timer()
+        pool = frozen_pool(init_worker, ({}, {}, citation_scope))
+    try:
+        for kind in ('domain', 'twitter'):
+            for batch in store.iter_pending(kind):
+                if pool is not None:
+                    data, referrals = match_sqlite_batch(pool, kind, batch, workers)
+                elif kind == 'domain':
+                    data = sqlite_records(kind, batch)
+                    _, referrals, _, _ = match_data(data, {}, citation_scope)
+                else:
+                    data = sqlite_records(kind, batch)
+                    _, _, _, referrals = match_data({}, data, citation_scope)
+                for article in data.values():
+                    store.complete_article(article)
+                with METRICS.stage('store_referrals') as stage:
+                    store.add_referrals(kind, referrals)
+                    store.flush()
+                    stage.add(len(batch))
+    finally:
+        if pool is not None:
+            pool.terminate()
+            thaw()
+    if pool is not None:
+        record_workers(workers, timer() - pool_start)
+
+
+def sqlite_records(kind, batch):
+    """
+    Returns the articles of a batch of the SqliteStore by url, the domain
+    articles as ArticleRecords reading their heavy fields back from
+    their DomainOutput file.
+    """
+    if kind == 'domain':
+        return {article['url']: ArticleRecord(article, './DomainOutput/' + article['id'] + '.json')  # nopep8
+                for article in batch}
+    return {tweet['url']: tweet for tweet in batch}
+
+
+def match_sqlite_batch(pool, kind, batch, workers):
+    """
+    Matches a batch of articles of the SqliteStore on pool, a frozen_pool
+    started for match_articles, in chunks of about even estimated cost.
+    The time of each process is added to workers, a WorkerTimes.
+    Returns the articles of the batch by url, with their citation fields,
+    and a ReferralStore of their referrals.
+    """
+    data = {article['url']: article for article in batch}
+    referrals = ReferralStore()
+    # the chunks are matched by cost, the referring ids keep the data order
+    referrals.reserve_ids(article['id'] for article in batch)
+    nodes = list(data)
+    costs = [article_cost(data[node]) for node in nodes]
+    tasks = [(kind, [data[node] for node in chunk])
+             for chunk in cost_chunks(nodes, costs, NUM_PROCS, POOL_BATCH_SIZE)]
+    with METRICS.stage('match_' + kind, len(batch)) as stage:
+        for pid, seconds, results, stats in pool.imap(match_articles, tasks):
+            workers.add(pid, seconds, len(results))
+            record_prefilter(stats)
+            for node, fields, links in results:
+                article = data[node]
+                article.update(fields)
+                for link in links:
+                    referrals.add(link, article['id'])
+            stage.add(len(results))
+    return data, referrals
 
 
 def write_to_file(dict, filename):
@@ -957,24 +1301,6 @@ def write_to_file(dict, filename):
         outfile.write(json_object)
 
 
-def load_saved_files():
-    '''Loads saved files from previous
-    processor run and returns them as dicts.'''
-    with open('Saved/domain_data.json') as json_file:
-        domain_data = json.load(json_file)
-
-    with open('Saved/twitter_data.json') as json_file:
-        twitter_data = json.load(json_file)
-
-    with open('Saved/domain_referrals.json') as json_file:
-        domain_referrals = json.load(json_file)
-
-    with open('Saved/twitter_referrals.json') as json_file:
-        twitter_referrals = json.load(json_file)
-
-    return domain_data, twitter_data, domain_referrals, twitter_referrals
-
-
 def create_static_nodes(scope):
     '''Creates nodes of type domain, twitter handle and text aliases,
     using each source from the scope.
@@ -987,7 +1313,7 @@ def create_static_nodes(scope):
         else:
             node_type = "twitter handle"
         # create uuid from string
-        uid = str(uuid.uuid5(uuid.NAMESPACE_DNS, source))
+        uid = node_id(source)
         data[source] = {'id': uid, 'url': source,
                         'domain': source,
                         "date": "",
@@ -999,7 +1325,7 @@ def create_static_nodes(scope):
 
         # create node for twitter handle, if exists
         for handle in scope[source]["twitter_handles"]:
-            uid = str(uuid.uuid5(uuid.NAMESPACE_DNS, handle))
+            uid = node_id(handle)
             data[handle] = {'id': uid, 'url': handle,
                             'domain': source,
                             "date": "",
@@ -1012,7 +1338,7 @@ def create_static_nodes(scope):
         # create node for text alias
         if scope[source]["aliases"]:
             alias = str(scope[source]["aliases"])
-            uid = str(uuid.uuid5(uuid.NAMESPACE_DNS, alias))
+            uid = node_id(alias)
             data[alias] = {'id': uid, 'url': alias,
                            'domain': source,
                            "date": "",
@@ -1027,20 +1353,38 @@ def create_static_nodes(scope):
 
 def parse_args():
     """
-    Parse the script arguments, setting NUM_PROCS & MEM_LIMIT accordingly
+    Parse the script arguments, setting NUM_PROCS & MEM_LIMIT accordingly,
+    switching on the globals of the given FLAGS and setting those of
+    the given VALUE_OPTIONS
     """
     global NUM_PROCS, MEM_LIMIT
-    usage = 'Usage: python3 processor.py [-num_procs=number [-limit=number]]'
-    if len(sys.argv) > 3 or len(sys.argv) == 2:
+    usage = 'Usage: python3 processor.py [-num_procs=number [-limit=number]] [' + \
+        '] ['.join(FLAGS) + '] [-since=YYYY-MM-DD] [-until=YYYY-MM-DD] ' + \
+        '[-domains=source,source,...]'
+    options = []
+    for op in sys.argv[1:]:
+        if op in FLAGS:
+            globals()[FLAGS[op]] = True
+        elif op.split('=')[0] in VALUE_OPTIONS and '=' in op:
+            spec, val = op.split('=', 1)
+            if spec in ('-since', '-until') and iso_date(val) != val:
+                print('Dates must be given as YYYY-MM-DD')
+                sys.exit(1)
+            globals()[VALUE_OPTIONS[spec]] = val
+        else:
+            options.append(op)
+    if len(options) > 2 or len(options) == 1:
         print(usage)
         sys.exit(1)
-    elif len(sys.argv) == 3:
-        options = sys.argv[1:]
+    elif len(options) == 2:
         if options[0] == options[1]:
             print(usage)
             sys.exit(1)
         for op in options:
             spec = op.split('=')[0]
+            if '=' not in op:
+                print(usage)
+                sys.exit(1)
             val = op.split('=')[1]
             if not val.isdigit():
                 print('Argument values must be positive integers')
@@ -1050,62 +1394,60 @@ def parse_args():
                 print(usage)
                 sys.exit(1)
             elif spec == '-num_procs':
+                if not can_fork():
+                    print('-num_procs needs processes to be forked, which this platform does not support')  # nopep8
+                    sys.exit(1)
                 NUM_PROCS = val
             elif spec == '-limit':
                 MEM_LIMIT = val
 
 
 if __name__ == '__main__':
-    # change this flag to true if restarting after a break,
-    # and want to use saved data.
-    read_from_memory = False
-
     parse_args()
     print('running with', NUM_PROCS, 'processes and', MEM_LIMIT, 'byte limit')
 
-    start = timer()
-    scope_timer = timer()
-    # load scopes
-    crawl_scope = load_scope('./crawl_scope.csv')
-    citation_scope = load_scope('./citation_scope.csv')
-
-    scope_timer_end = timer()
-
-    twitter_timer = timer()
-    print('loading twitter data')
-    # load twitter data
-    twitter_data, twitter_pairs = load_twitter_csv()
-
-    twitter_timer_end = timer()
-
-    domain_timer = timer()
-    print('loading domain data')
-    # load domain data
-    domain_data, domain_pairs = load_json()
-
-    logging.info("finished loading data")
-
-    domain_timer_end = timer()
-    if read_from_memory:
-        # read saved data into memory
-        domain_data, twitter_data, domain_referrals, twitter_referrals = load_saved_files()  # nopep8
-        process_crawler(domain_data, twitter_data,
-                        crawl_scope, citation_scope, domain_pairs, twitter_pairs,
-                        domain_referrals, twitter_referrals)
+    with METRICS.stage('load_scope') as stage:
+        # load scopes
+        crawl_scope = load_scope('./crawl_scope.csv')
+        citation_scope = load_scope('./citation_scope.csv')
+        # precompute everything that only depends on the scopes
+        crawl_scope = ScopeIndex(crawl_scope)
+        citation_scope = ScopeIndex(citation_scope)
+        stage.add(len(crawl_scope) + len(citation_scope))
+
+    if INCREMENTAL:
+        # the new files are loaded by process_incremental
+        process_incremental(crawl_scope, citation_scope)
+    elif SQLITE:
+        # the data is loaded into the database by process_sqlite
+        process_sqlite(crawl_scope, citation_scope)
     else:
-        process_crawler(domain_data, twitter_data,
-                        crawl_scope, citation_scope, domain_pairs, twitter_pairs)
-    end = timer()
-    # Time in seconds
-
-    # Convert output.csv to output.xlsx
-    df = pd.read_csv('Output/output.csv')
-    df = df.applymap(lambda x: x.encode('unicode_escape').decode(
-        'utf-8') if isinstance(x, str) else x)
-    df.to_excel('Output/output.xlsx')
-
-    logging.info("Time to run whole post-processor took " + str(end - start) + " seconds")  # nopep8
-    logging.info("Time to read scope took " + str(scope_timer_end - scope_timer) + " seconds")  # nopep8
-    logging.info("Time to read twitter files took " + str(twitter_timer_end - twitter_timer) + " seconds")  # nopep8
-    logging.info("Time to read domain files took " + str(domain_timer_end - domain_timer) + " seconds")  # nopep8
+        # the referrals of the articles pruned by the load filter
+        saved_referrals = {'domain': ReferralStore(), 'twitter': ReferralStore()}  # nopep8
+        load_filter = make_load_filter(crawl_scope)
+        print('loading twitter data')
+        # load twitter data
+        twitter_data, twitter_pairs = load_twitter_csv(None, load_filter, saved_referrals['twitter'])  # nopep8
+
+        print('loading domain data')
+        # load domain data
+        domain_data, domain_pairs = load_json(LAZY_LOAD, NUM_PROCS, None, load_filter,  # nopep8
+                                              saved_referrals['domain'])
+
+        logging.info("finished loading data")
+
+        if RESUME:
+            # skip the articles completed before the break
+            replayed = replay({'domain': domain_data, 'twitter': twitter_data},
+                              CITATION_FIELDS)
+            for kind in replayed:
+                saved_referrals[kind].update(replayed[kind])
+        with CheckpointLog(append=RESUME) as checkpoint:
+            process_crawler(domain_data, twitter_data,
+                            crawl_scope, citation_scope, domain_pairs, twitter_pairs,
+                            saved_referrals['domain'], saved_referrals['twitter'],
+                            checkpoint)
+    report_prefilter()
+    metrics = METRICS.write()
+    logging.info("Time to run whole post-processor took " + str(metrics['total_seconds']) + " seconds")  # nopep8
     logging.info("FINISHED")
@@ -0,0 +1,79 @@
+"""
+prune.py
+Description: Load time pruning of the articles and tweets that can not
+reach the output (python3 processor.py -prune): domain articles whose
+domain is not in the crawl scope, and, if a date window (-since, -until)
+or a subset of the crawl scope domains (-domains) is given, the articles
+and tweets outside of it. Pruned articles are not kept or matched, but
+the urls they link to are still recorded as referrals, so the nodes they
+refer to keep them as referring articles.
+"""
+import re
+
+# the start of a date in iso format, e.g. 2021-01-31 or 2021-01-31T10:00:00
+ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def iso_date(value):
+    """Returns the YYYY-MM-DD date that value starts with, or None."""
+    if isinstance(value, str) and ISO_DATE.match(value):
+        return value[:10]
+    return None
+
+
+def found_links(kind, article):
+    """Returns the urls in the found_urls of article of kind
+    ('domain' or 'twitter')."""
+    if kind == 'domain':
+        return [link['url'] for link in article['found_urls']]
+    return list(article['found_urls'])
+
+
+class LoadFilter:
+    """
+    Decides which articles are kept at load time:
+        crawl_scope: a domain article is kept only if its domain is in it
+        since, until: YYYY-MM-DD dates, articles and tweets dated before
+                      since or after until are pruned (those without an
+                      iso date are kept)
+        domains: a set of crawl scope domains, if given, only domain
+                 articles of these domains are kept
+    pruned counts the pruned articles of each kind.
+    """
+
+    def __init__(self, crawl_scope, since=None, until=None, domains=None):
+        self.crawl_scope = crawl_scope
+        self.since = since
+        self.until = until
+        self.domains = domains
+        self.pruned = {'domain': 0, 'twitter': 0}
+
+    def in_window(self, article):
+        date = iso_date(article.get('date'))
+        if date is None:
+            return True
+        return (self.since is None or date >= self.since) and \
+            (self.until is None or date <= self.until)
+
+    def keep(self, kind, article):
+        """Returns True if article of kind can reach the output."""
+        if kind == 'domain':
+            if article.get('domain') not in self.crawl_scope:
+                return False
+            if self.domains is not None and article['domain'] not in self.domains:  # nopep8
+                return False
+        return self.in_window(article)
+
+    def filter(self, kind, articles, add_referral):
+        """
+        Yields the articles of kind that are kept. For each pruned
+        article add_referral(url, article id) is called with each url
+        it links to.
+        """
+        for article in articles:
+            if self.keep(kind, article):
+                yield article
+                continue
+            self.pruned[kind] += 1
+            for link in found_links(kind, article):
+                add_referral(link, article['id'])
@@ -0,0 +1,241 @@
+"""
+referral_store.py
+Description: Compact storage for the referrals found by the processor,
+i.e. for each url (or scope source) the ids of the articles referring
+to it. Urls and ids are interned to integers and every edge is kept
+as one int64 (url index << 32 | id index) in a sorted array without
+duplicates, so the same 36 character id is stored only once.
+Urls are stored in their canonical form (see urls.py), so the
+variants of one url share a key.
+Stores that grow too large can be written to disk as key sorted runs
+and streamed back with a k-way merge.
+"""
+from array import array
+import heapq
+import itertools
+import json
+import sys
+import numpy as np
+from urls import canonical_url
+
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+# number of buffered edges after which the buffer is merged into the array
+COMPACT_EVERY = 1000000
+
+
+class ReferralStore:
+    """
+    A mapping of url -> list of referring article ids with built in
+    dedupe. Supports `in`, iteration over the urls (in the order they
+    were first added), len(), store[url] and items() like the referral
+    dicts it replaces. Urls are added and looked up by their
+    canonical_url, unless canonical is False.
+    """
+
+    def __init__(self, canonical=True):
+        self.canonical = canonical
+        self.key_index = {}
+        self.keys = []
+        self.id_index = {}
+        self.ids = []
+        # sorted unique edge codes, and the offsets of each key in it
+        self._codes = np.zeros(0, dtype=np.int64)
+        self._offsets = None
+        # edges not merged into _codes yet
+        self._pending = array('q')
+        self._pending_arrays = []
+        # size of the interned url and id strings
+        self._string_bytes = 0
+
+    @classmethod
+    def from_dict(cls, referrals):
+        """Builds a store from a dict of url -> list of ids."""
+        store = cls()
+        store.update(referrals)
+        return store
+
+    def canonical_key(self, url):
+        """Returns the key url is stored under."""
+        return canonical_url(url) if self.canonical else url
+
+    def _key(self, url):
+        index = self.key_index.get(url)
+        if index is None:
+            index = len(self.keys)
+            self.key_index[url] = index
+            self.keys.append(url)
+            self._string_bytes += sys.getsizeof(url)
+        return index
+
+    def _id(self, article_id):
+        index = self.id_index.get(article_id)
+        if index is None:
+            index = len(self.ids)
+            self.id_index[article_id] = index
+            self.ids.append(article_id)
+            self._string_bytes += sys.getsizeof(article_id)
+        return index
+
+    def reserve_ids(self, article_ids):
+        """
+        Interns article_ids in their order before any of their edges are
+        added, so the ids of each url are returned in this order instead
+        of the order their edges are added in.
+        """
+        for article_id in article_ids:
+            self._id(article_id)
+
+    def add(self, url, article_id):
+        """Records that the article article_id refers to url."""
+        self._pending.append(
+            (self._key(self.canonical_key(url)) << ID_BITS) | self._id(article_id))
+        if len(self._pending) >= COMPACT_EVERY:
+            self.compact()
+
+    def update(self, other):
+        """
+        Merges other, a ReferralStore or a dict of url -> list of ids,
+        into this store.
+        """
+        if isinstance(other, ReferralStore):
+            other.compact()
+            key_map = np.array([self._key(self.canonical_key(url)) for url in other.keys],
+                               dtype=np.int64)
+            id_map = np.array([self._id(article_id) for article_id in other.ids],
+                              dtype=np.int64)
+            if len(other._codes):
+                self._pending_arrays.append(
+                    (key_map[other._codes >> ID_BITS] << ID_BITS) |
+                    id_map[other._codes & ID_MASK])
+        else:
+            for url, article_ids in other.items():
+                for article_id in article_ids:
+                    self.add(url, article_id)
+        self._offsets = None
+
+    def compact(self):
+        """Merges the pending edges into the sorted edge array."""
+        if not len(self._pending) and not self._pending_arrays:
+            return
+        parts = [self._codes, np.frombuffer(self._pending, dtype=np.int64)]
+        self._codes = np.unique(np.concatenate(parts + self._pending_arrays))
+        self._pending = array('q')
+        self._pending_arrays = []
+        self._offsets = None
+
+    def remove_ids(self, article_ids):
+        """
+        Removes every edge of the given article ids. Returns the urls
+        that lost an edge, they stay in the store even if no id is left.
+        """
+        indices = [self.id_index[article_id] for article_id in article_ids
+                   if article_id in self.id_index]
+        if not indices:
+            return []
+        self.compact()
+        removed = np.isin(self._codes & ID_MASK, np.array(indices, dtype=np.int64))  # nopep8
+        keys = np.unique(self._codes[removed] >> ID_BITS)
+        self._codes = self._codes[~removed]
+        self._offsets = None
+        return [self.keys[index] for index in keys.tolist()]
+
+    def _key_offsets(self):
+        self.compact()
+        if self._offsets is None or len(self._offsets) != len(self.keys) + 1:
+            self._offsets = np.searchsorted(
+                self._codes >> ID_BITS, np.arange(len(self.keys) + 1))
+        return self._offsets
+
+    def freeze(self):
+        """
+        Merges the pending edges and computes the offsets of the keys
+        now, so that looking up urls only reads the store, e.g. in the
+        processes of a pool forked with it.
+        """
+        self._key_offsets()
+
+    def get(self, url, default=None):
+        """Returns the ids referring to url, in the order
+        they were first seen, or default if url has none."""
+        index = self.key_index.get(self.canonical_key(url))
+        if index is None:
+            return default
+        offsets = self._key_offsets()
+        codes = self._codes[offsets[index]:offsets[index + 1]]
+        return [self.ids[i] for i in (codes & ID_MASK).tolist()]
+
+    def __getitem__(self, url):
+        ids = self.get(url)
+        if ids is None:
+            raise KeyError(url)
+        return ids
+
+    def __contains__(self, url):
+        return self.canonical_key(url) in self.key_index
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def items(self):
+        for url in self.keys:
+            yield url, self[url]
+
+    def num_edges(self):
+        """Returns the number of distinct (url, id) edges."""
+        self.compact()
+        return len(self._codes)
+
+    def __sizeof__(self):
+        """Approximate memory used by the store, in bytes."""
+        return object.__sizeof__(self) + self._string_bytes + \
+            sys.getsizeof(self.key_index) + sys.getsizeof(self.keys) + \
+            sys.getsizeof(self.id_index) + sys.getsizeof(self.ids) + \
+            self._codes.nbytes + self._pending.buffer_info()[1] * self._pending.itemsize + \
+            sum(part.nbytes for part in self._pending_arrays)
+
+    def to_dict(self):
+        """Returns the referrals as a dict of url -> list of ids."""
+        return dict(self.items())
+
+    def clear(self):
+        self.__init__(self.canonical)
+
+
+def write_run(store, path):
+    """
+    Writes the referrals of store to path as a run: one json list
+    [url, [ids]] per line, sorted by url.
+    """
+    with open(path, 'w') as run:
+        for url in sorted(store.keys):
+            run.write(json.dumps([url, store[url]]) + '\n')
+
+
+def iter_run(path):
+    """Yields (url, ids) from the run at path, one line at a time."""
+    with open(path) as run:
+        for line in run:
+            url, ids = json.loads(line)
+            yield url, ids
+
+
+def merge_runs(paths, dest):
+    """
+    Merges the runs at paths into dest, a ReferralStore, with a streaming
+    k-way merge: only the current group of lines with the same url is
+    held in memory for each run, and its ids are deduped once.
+    Returns the number of urls merged.
+    """
+    merged = heapq.merge(*[iter_run(path) for path in paths],
+                         key=lambda item: item[0])
+    count = 0
+    for url, group in itertools.groupby(merged, key=lambda item: item[0]):
+        for article_id in dict.fromkeys(itertools.chain.from_iterable(
+                ids for _, ids in group)):
+            dest.add(url, article_id)
+        count += 1
+    return count
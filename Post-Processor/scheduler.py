@@ -0,0 +1,95 @@
+"""
+scheduler.py
+Description: Splits the articles matched by the pool of processor.py
+into chunks by their estimated cost, so a few huge pages do not leave
+one process working long after the others are done. The articles are
+sorted from the most to the least costly and cut into chunks of a
+shrinking share of the cost still left (guided self scheduling), which
+the processes take from the pool's task queue as soon as they are free.
+WorkerTimes adds up how long each process was busy and idle.
+"""
+import logging
+
+# estimated cost of an article besides its text, in characters
+ARTICLE_COST = 200
+# estimated cost of a found url of an article, in characters
+LINK_COST = 100
+# a chunk gets 1 / (CHUNKS_PER_WORKER * processes) of the cost left
+CHUNKS_PER_WORKER = 4
+# the cost of a chunk is at least this, unless it is the last one
+MIN_CHUNK_COST = 50000
+
+
+def article_cost(article):
+    """
+    Returns the estimated cost of matching article: the length of the
+    text it is searched in (html_content, or article_len / article_text
+    if it is not in memory, e.g. for an ArticleRecord with a path), its
+    found urls and a fixed ARTICLE_COST.
+    """
+    size = len(article.get('html_content') or '')
+    if not size:
+        size = article.get('article_len')
+        if not isinstance(size, int):
+            size = len(article.get('article_text') or '')
+    return ARTICLE_COST + size + LINK_COST * len(article.get('found_urls') or ())  # nopep8
+
+
+def cost_chunks(nodes, costs, num_workers, max_items=100):
+    """
+    Returns nodes cut into chunks (lists of nodes), given their costs.
+    The nodes are sorted by decreasing cost, equal costs keeping their
+    order, and each chunk takes nodes until its cost reaches the cost
+    left divided by CHUNKS_PER_WORKER * num_workers (at least
+    MIN_CHUNK_COST) or it has max_items nodes. The chunks get smaller
+    towards the end, so the processes finish at about the same time.
+    """
+    order = sorted(range(len(nodes)), key=lambda i: -costs[i])
+    remaining = sum(costs)
+    parts = CHUNKS_PER_WORKER * max(num_workers, 1)
+    chunks, chunk, chunk_cost = [], [], 0
+    for i in order:
+        chunk.append(nodes[i])
+        chunk_cost += costs[i]
+        if chunk_cost >= max(remaining / parts, MIN_CHUNK_COST) or len(chunk) >= max_items:  # nopep8
+            chunks.append(chunk)
+            remaining -= chunk_cost
+            chunk, chunk_cost = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class WorkerTimes:
+    """
+    The busy time, chunks and items of each process of a pool, by
+    process id, in the order they first returned a chunk.
+    """
+
+    def __init__(self):
+        self.workers = {}
+
+    def add(self, pid, seconds, items):
+        """Adds a chunk of items the process pid took seconds for."""
+        worker = self.workers.setdefault(pid, {'busy_seconds': 0.0,
+                                               'chunks': 0, 'items': 0})
+        worker['busy_seconds'] += seconds
+        worker['chunks'] += 1
+        worker['items'] += items
+
+    def report(self, wall_seconds):
+        """
+        Returns a list of the workers' busy_seconds, idle_seconds (the
+        part of wall_seconds, the time the pool ran, they were not busy),
+        chunks and items, and logs them.
+        """
+        workers = []
+        for number, worker in enumerate(self.workers.values(), 1):
+            worker = dict(worker, idle_seconds=max(wall_seconds - worker['busy_seconds'], 0.0))  # nopep8
+            logging.info('Worker ' + str(number) + ': busy ' +
+                         str(round(worker['busy_seconds'], 3)) + ' seconds, idle ' +  # nopep8
+                         str(round(worker['idle_seconds'], 3)) + ' seconds, ' +
+                         str(worker['items']) + ' articles in ' +
+                         str(worker['chunks']) + ' chunks')
+            workers.append(worker)
+        return workers
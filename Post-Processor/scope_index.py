@@ -0,0 +1,182 @@
+"""
+scope_index.py
+Description: Precomputed lookup structures for a scope loaded by
+processor.load_scope. Everything in here only depends on the scope,
+so it is built once per run instead of once per article.
+"""
+import logging
+import re
+import tldextract
+from urllib.parse import urlsplit
+from timeit import default_timer as timer
+from alias_matcher import AliasMatcher
+
+# the <a href=...> tag of a link to an http(s) url with a path, with
+# the same shape as the per domain patterns the processor used before:
+# the groups are scheme, host and path. Its parts and the anchor text
+# after it are bounded, so no single search can run over a whole page.
+MAX_TAG = 10000
+TAG_BOUND = '{0,' + str(MAX_TAG) + '}'
+ANCHOR_TAG = re.compile(
+    r"<a\s+href=[\"'](https?://)([^/\"'\n]" + TAG_BOUND + r")/([^\"'\n]" + TAG_BOUND +
+    r")[\"'][^>\n]" + TAG_BOUND + ">", re.IGNORECASE)
+ANCHOR_CLOSE = re.compile(r'</a>', re.IGNORECASE)
+# the anchor text is the text up to the first </a> after the tag, if it
+# is at most this long and on the same line
+MAX_ANCHOR_TEXT = 10000
+# seconds spent on the anchors of a single page before giving up on it
+ANCHOR_TIME_LIMIT = 30
+TWITTER_HOSTS = ('twitter.com', 'www.twitter.com')
+
+
+def normalize_handle(handle):
+    """Returns the twitter handle without '@', surrounding spaces and case."""
+    return handle.replace('@', '').strip().lower()
+
+
+def split_url(url):
+    """
+    Returns the lowercase host of url and, for twitter urls, the
+    lowercase first segment of the path if more of the path follows it
+    (the handle in https://twitter.com/<handle>/status/...), else None.
+    """
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return '', None
+    host = parts.netloc.lower()
+    if host not in TWITTER_HOSTS:
+        return host, None
+    segments = parts.path.split('/', 2)
+    if len(segments) < 3 or segments[0] != '':
+        return host, None
+    return host, segments[1].lower()
+
+
+def scope_domain(ext):
+    """Returns the domain of a tldextract result as written in the scope,
+    the subdomain is kept unless it is empty."""
+    if ext[0] == '':
+        return ext[1] + '.' + ext[2]
+    return '.'.join(ext)
+
+
+class ScopeIndex(dict):
+    """
+    The scope dictionary (source -> info) together with the lookup
+    structures that the citation matchers and create_output need:
+        extracts: http source -> tldextract result
+        domains: http source -> domain the source is cited by
+        position: source -> position of the source in the scope
+        handles: source -> set of normalized twitter handles
+        handle_to_sources: normalized handle -> list of (source, handle)
+        host_to_sources: hostname -> list of http sources
+        domain_to_sources: lowercase domain -> list of http sources
+        matcher: AliasMatcher over all text aliases and handles
+    """
+
+    def __init__(self, scope):
+        super().__init__(scope)
+        self.extracts = {}
+        self.domains = {}
+        self.position = {}
+        self.handles = {}
+        self.handle_to_sources = {}
+        self.host_to_sources = {}
+        self.domain_to_sources = {}
+        self._node_extracts = {}
+        for source, info in self.items():
+            self.position[source] = len(self.position)
+            if 'http' in source:
+                ext = tldextract.extract(source)
+                domain = scope_domain(ext)
+                self.extracts[source] = ext
+                self.domains[source] = domain
+                for host in (domain.lower(), 'www.' + domain.lower()):
+                    self.host_to_sources.setdefault(host, []).append(source)
+                self.domain_to_sources.setdefault(
+                    domain.lower(), []).append(source)
+            self.handles[source] = set()
+            for handle in info['twitter_handles']:
+                normalized = normalize_handle(handle)
+                self.handles[source].add(normalized)
+                self.handle_to_sources.setdefault(
+                    normalized, []).append((source, handle))
+        self.matcher = AliasMatcher(self)
+
+    def extract(self, url):
+        """Returns the tldextract result of url, cached per url."""
+        ext = self._node_extracts.get(url)
+        if ext is None:
+            ext = tldextract.extract(url)
+            self._node_extracts[url] = ext
+        return ext
+
+    def info(self, source, key, default=''):
+        """Returns the value of key in the scope entry of source,
+        or default if the source or key is not in the scope."""
+        try:
+            return self[source][key]
+        except (KeyError, TypeError):
+            return default
+
+    def sources_for_host(self, host):
+        """Returns the http sources whose domain is host or a parent
+        domain of host, e.g. news.example.com for example.com."""
+        sources = []
+        labels = host.split('.')
+        for i in range(len(labels)):
+            sources += self.domain_to_sources.get('.'.join(labels[i:]), [])
+        return sources
+
+    def is_recursive(self, source, ext_node):
+        """Returns True if source is an http source of the same
+        domain as the tldextract result ext_node."""
+        return source in self.extracts and self.extracts[source] == ext_node
+
+    def find_anchor_citations(self, html, ext_node, url=''):
+        """
+        Tokenizes the <a href> links of html once and looks up
+        each host in host_to_sources. Links to the article's own
+        domain (ext_node) are skipped. Each tag and anchor text is
+        searched for within a bounded window, and the page is given up
+        on (with a warning) once it took more than ANCHOR_TIME_LIMIT.
+        Returns a dict of source to a list of (citation url, anchor text)
+        in the order the links appear in html. Like a search of each
+        source on its own, the links of a source nested in an anchor of
+        the same source are skipped.
+        """
+        found = {}
+        # the end of the last anchor of each source
+        source_end = {}
+        start = timer()
+        pos = 0
+        while True:
+            tag = ANCHOR_TAG.search(html, pos)
+            if tag is None:
+                break
+            if timer() - start > ANCHOR_TIME_LIMIT:
+                logging.warning('Stopped matching anchors of ' + url + ' after ' +
+                                str(ANCHOR_TIME_LIMIT) + ' seconds')
+                break
+            # look for the next tag after the start of this one, so the
+            # anchors of other sources nested in it are seen
+            pos = tag.start() + 1
+            close = ANCHOR_CLOSE.search(html, tag.end(), tag.end() + MAX_ANCHOR_TEXT + 4)  # nopep8
+            if close is None or html.find('\n', tag.end(), close.start()) != -1:
+                continue
+            scheme, host, path = tag.groups()
+            text = html[tag.end():close.start()]
+            lower_host = host.lower()
+            for source in self.host_to_sources.get(lower_host, ()):
+                if self.extracts[source] == ext_node or tag.start() < source_end.get(source, 0):  # nopep8
+                    continue
+                source_end[source] = close.end()
+                domain = self.domains[source]
+                if lower_host == domain.lower():
+                    prefix = scheme
+                else:
+                    prefix = scheme + host[:4]
+                found.setdefault(source, []).append(
+                    (prefix + domain + '/' + path, text))
+        return found
@@ -0,0 +1,222 @@
+"""
+sqlite_store.py
+Description: SQLite storage for the processor
+(python3 processor.py -sqlite), so articles, pairings and referrals
+live in indexed tables on disk instead of dictionaries in memory.
+Writes are buffered and inserted in batches, and each batch is
+committed, so the tables can be queried while a run is in progress.
+"""
+import json
+import sqlite3
+from urls import canonical_url
+
+SQLITE_PATH = './Saved/processor.db'
+# number of buffered rows after which they are inserted and committed
+BATCH_SIZE = 10000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    completed INTEGER NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_kind ON articles (kind);
+CREATE INDEX IF NOT EXISTS articles_todo ON articles (kind, completed);
+CREATE TABLE IF NOT EXISTS pairings (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS referrals (
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    article_id TEXT NOT NULL,
+    UNIQUE (url, kind, article_id)
+);
+'''
+
+# the referring ids of each article, domain referrals before twitter
+# referrals and each in the order they were added, like parse_referrals.
+# Articles are scanned with articles_kind and their referrals looked up
+# with the unique index of referrals, which starts with the url.
+REFERRALS_JOIN = '''
+SELECT a.rowid, a.kind, a.record, r.article_id
+FROM articles AS a LEFT JOIN referrals AS r ON r.url = a.key
+ORDER BY a.kind, a.rowid, r.kind, r.rowid
+'''
+
+
+class SqliteStore:
+    """
+    The tables of a processor run in the database at path:
+        articles: url, key (the canonical url), id, kind ('domain' or
+                  'twitter'), completed and record, the article as json
+                  (domain articles without their heavy fields, which
+                  stay in their file)
+        pairings: article id -> kind, url and domain
+        referrals: (canonical url, kind, id of an article referring to it)
+    """
+
+    def __init__(self, path=SQLITE_PATH, batch_size=BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self._articles = []
+        self._pairings = []
+        self._referrals = []
+        self._completed = []
+
+    def add_article(self, kind, article, pairing_domain):
+        """
+        Adds article and its pairing, unless an article with its url is
+        already stored (e.g. completed by an earlier, interrupted run).
+        """
+        self._articles.append((article['url'], canonical_url(article['url']), article['id'], kind,
+                               int(article['completed']), json.dumps(dict(article.items()))))
+        self._pairings.append((article['id'], kind, article['url'], pairing_domain))
+        self._maybe_flush(self._articles)
+
+    def complete_article(self, article):
+        """Stores article, with its citation fields, as completed."""
+        article['completed'] = True
+        self._completed.append((json.dumps(dict(article.items())), article['url']))
+        self._maybe_flush(self._completed)
+
+    def add_referral(self, kind, url, article_id):
+        """Records that the article article_id of kind refers to url."""
+        self._referrals.append((canonical_url(url), kind, article_id))
+        self._maybe_flush(self._referrals)
+
+    def add_referrals(self, kind, referrals):
+        """Adds each edge of referrals, a ReferralStore or dict of lists."""
+        for url, article_ids in referrals.items():
+            for article_id in article_ids:
+                self.add_referral(kind, url, article_id)
+
+    def _maybe_flush(self, buffer):
+        if len(buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Inserts the buffered rows in one transaction."""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?, ?)',
+                self._articles)
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO pairings VALUES (?, ?, ?, ?)',
+                self._pairings)
+            self.conn.executemany(
+                'UPDATE articles SET record = ?, completed = 1 WHERE url = ?',
+                self._completed)
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO referrals VALUES (?, ?, ?)',
+                self._referrals)
+        self._articles = []
+        self._pairings = []
+        self._completed = []
+        self._referrals = []
+
+    def count(self, kind, completed=None):
+        """Returns the number of articles of kind, only the completed
+        or not completed ones if completed is given."""
+        if completed is None:
+            query, args = 'SELECT count(*) FROM articles WHERE kind = ?', (kind,)
+        else:
+            query = 'SELECT count(*) FROM articles WHERE kind = ? AND completed = ?'
+            args = (kind, int(completed))
+        return self.conn.execute(query, args).fetchone()[0]
+
+    def iter_pending(self, kind, batch_size=None):
+        """
+        Yields lists of up to batch_size articles of kind that are not
+        completed, paging by rowid so the articles can be completed
+        while they are iterated.
+        """
+        batch_size = batch_size or self.batch_size
+        last = 0
+        while True:
+            rows = self.conn.execute(
+                'SELECT rowid, record FROM articles WHERE kind = ? AND '
+                'completed = 0 AND rowid > ? ORDER BY rowid LIMIT ?',
+                (kind, last, batch_size)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [json.loads(record) for _, record in rows]
+
+    def iter_referred_articles(self):
+        """
+        Yields (kind, article, referring ids) for every article, with
+        the ids of the articles referring to its url, deduped and without
+        the article itself, in the order of parse_referrals.
+        """
+        self.flush()
+        current, ids = None, []
+        for rowid, kind, record, article_id in self.conn.execute(REFERRALS_JOIN):
+            if current is None or rowid != current[0]:
+                if current is not None:
+                    yield self._referred(current[1], current[2], ids)
+                current, ids = (rowid, kind, record), []
+            if article_id is not None:
+                ids.append(article_id)
+        if current is not None:
+            yield self._referred(current[1], current[2], ids)
+
+    @staticmethod
+    def _referred(kind, record, ids):
+        article = json.loads(record)
+        referring = list(dict.fromkeys(ids))
+        if article['id'] in referring:
+            referring.remove(article['id'])
+        return kind, article, referring
+
+    def pairings(self, kind):
+        """Returns a PairingView of the pairings of kind."""
+        return PairingView(self, kind)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PairingView:
+    """
+    Read only mapping of article id -> pairing dict for the articles
+    of one kind, looked up in the pairings table. Stands in for the
+    domain_pairs and twitter_pairs dictionaries in create_output.
+    """
+
+    def __init__(self, store, kind):
+        self.store = store
+        self.kind = kind
+        self.domain_key = 'domain' if kind == 'domain' else 'twitter_handle'
+
+    def keys(self):
+        return self
+
+    def __contains__(self, article_id):
+        return self.store.conn.execute(
+            'SELECT 1 FROM pairings WHERE id = ? AND kind = ?',
+            (article_id, self.kind)).fetchone() is not None
+
+    def __getitem__(self, article_id):
+        row = self.store.conn.execute(
+            'SELECT url, domain FROM pairings WHERE id = ? AND kind = ?',
+            (article_id, self.kind)).fetchone()
+        if row is None:
+            raise KeyError(article_id)
+        return {'url': row[0], self.domain_key: row[1]}
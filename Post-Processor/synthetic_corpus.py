@@ -0,0 +1,222 @@
+"""
+synthetic_corpus.py
+Description: Writes a synthetic crawl that processor.py can run on:
+DomainOutput/ json articles, a TwitterOutput/ csv of tweets, and the
+crawl_scope.csv and citation_scope.csv they are matched against.
+The number of articles and tweets, the size of the html, the number of
+links per article and of aliases per source can be set, and the text
+mixes English, Hebrew and Arabic words. The same options and seed
+always write the same corpus.
+Usage: python3 synthetic_corpus.py [-dir=path] [-articles=number] ...
+(see DEFAULTS for all the options)
+"""
+import csv
+import json
+import os
+import random
+import sys
+from ids import uuid5_id
+
+DEFAULTS = {
+    'dir': '.',
+    'articles': 1000,
+    # tweets, 0 for as many as articles
+    'tweets': 0,
+    # characters of html_content of an article, on average
+    'html_size': 5000,
+    # found_urls of an article, on average
+    'links': 10,
+    # sources of the citation scope, the first crawl_sources are crawled
+    'sources': 50,
+    'crawl_sources': 10,
+    # text aliases of each source
+    'aliases': 3,
+    # chance of a word of the text being an alias or a handle of a source
+    'alias_density': 0.01,
+    'seed': 0,
+}
+SCOPE_COLUMNS = ['Name', 'Source', 'Type', 'Text Aliases',
+                 'Associated Twitter Handle', 'Tags', 'Associated Publisher']
+TWITTER_COLUMNS = ['tweet_url', 'twitter_handle', 'text', 'created_at', 'lang',
+                   'tags', 'entities', 'citation_urls']
+WORDS = {
+    'en': ['the', 'minister', 'said', 'on', 'government', 'report', 'peace',
+           'talks', 'city', 'army', 'people', 'new', 'after', 'election',
+           'court', 'border', 'week', 'according', 'to', 'officials'],
+    'he': ['הממשלה', 'אמר', 'ראש', 'שר', 'העיר', 'שלום', 'בחירות', 'צבא',
+           'היום', 'על', 'של', 'דיווח', 'גבול', 'בית', 'המשפט'],
+    'ar': ['الحكومة', 'قال', 'وزير', 'المدينة', 'السلام', 'الانتخابات',
+           'الجيش', 'اليوم', 'على', 'في', 'تقرير', 'الحدود', 'المحكمة'],
+}
+LANGUAGES = list(WORDS)
+SECTIONS = ['news', 'world', 'opinion', 'middle-east', 'politics']
+
+
+class Source:
+    """A source of the scope: a news site or a twitter handle."""
+
+    def __init__(self, index, rand, num_aliases):
+        self.index = index
+        language = LANGUAGES[index % len(LANGUAGES)]
+        self.name = 'Source ' + str(index)
+        self.is_twitter = index % 5 == 4
+        self.handle = '@source' + str(index)
+        self.host = 'www.source' + str(index) + '.com'
+        self.source = self.handle if self.is_twitter else 'https://' + self.host + '/'  # nopep8
+        # aliases of one to three words, in the language of the source
+        self.aliases = [' '.join(rand.choice(WORDS[language])
+                                 for _ in range(rand.randint(1, 3))) +
+                        ' ' + str(index) + '-' + str(alias)
+                        for alias in range(num_aliases)]
+        if not self.is_twitter:
+            self.aliases.append(self.name)
+
+    def scope_row(self):
+        return [self.name, self.source,
+                'Twitter Handle' if self.is_twitter else 'News Source',
+                '|'.join(self.aliases), self.handle, 'synthetic|tag' + str(self.index % 3),  # nopep8
+                'Publisher ' + str(self.index)]
+
+
+class Corpus:
+    """The sources and urls of a corpus, see generate."""
+
+    def __init__(self, options):
+        self.options = options
+        self.rand = random.Random(options['seed'])
+        self.sources = [Source(index, self.rand, options['aliases'])
+                        for index in range(options['sources'])]
+        self.crawled = [source for source in self.sources[:options['crawl_sources']]  # nopep8
+                        if not source.is_twitter] or [self.sources[0]]
+        self.num_tweets = options['tweets'] or options['articles']
+
+    def article_url(self, index):
+        source = self.crawled[index % len(self.crawled)]
+        return 'https://' + source.host + '/' + \
+            SECTIONS[index % len(SECTIONS)] + '/' + str(index)
+
+    def tweet_url(self, index):
+        source = self.sources[index % len(self.sources)]
+        return 'https://twitter.com/' + source.handle[1:] + '/status/' + str(index)  # nopep8
+
+    def text(self, num_chars, language):
+        """Returns about num_chars of text, mostly in language,
+        with an alias or handle of a source now and then."""
+        words, size = [], 0
+        while size < num_chars:
+            if self.rand.random() < self.options['alias_density']:
+                source = self.rand.choice(self.sources)
+                word = self.rand.choice(source.aliases + [source.handle])
+            elif self.rand.random() < 0.1:
+                word = self.rand.choice(WORDS[self.rand.choice(LANGUAGES)])
+            else:
+                word = self.rand.choice(WORDS[language])
+            words.append(word)
+            size += len(word) + 1
+        return ' '.join(words)
+
+    def link(self):
+        """Returns a random link: another article, a tweet, a page of a
+        source that is not crawled, or a link to an article written the
+        way crawlers find them (http, no www., trailing slash)."""
+        choice = self.rand.random()
+        if choice < 0.4:
+            return self.article_url(self.rand.randrange(self.options['articles']))  # nopep8
+        if choice < 0.55:
+            url = self.article_url(self.rand.randrange(self.options['articles']))  # nopep8
+            return url.replace('https://www.', 'http://') + '/'
+        if choice < 0.8:
+            return self.tweet_url(self.rand.randrange(self.num_tweets))
+        source = self.rand.choice(self.sources)
+        return 'https://' + source.host + '/page/' + str(self.rand.randrange(1000))  # nopep8
+
+    def num_links(self):
+        return self.rand.randint(0, 2 * self.options['links'])
+
+    def article(self, index):
+        url = self.article_url(index)
+        language = LANGUAGES[index % len(LANGUAGES)]
+        links = [self.link() for _ in range(self.num_links())]
+        paragraphs = []
+        size = self.rand.randint(self.options['html_size'] // 2,
+                                 self.options['html_size'] * 3 // 2)
+        num_paragraphs = max(len(links), 1)
+        for i in range(num_paragraphs):
+            paragraph = self.text(size // num_paragraphs, language)
+            if i < len(links):
+                paragraph += ' <a href="' + links[i] + '">' + \
+                    self.text(20, language) + '</a>'
+            paragraphs.append('<p>' + paragraph + '</p>')
+        html = '<html><body>' + '\n'.join(paragraphs) + '</body></html>'
+        text = self.text(size // 4, language)
+        return {
+            'title': self.text(40, language),
+            'url': url,
+            'author_metadata': None,
+            'date': '2021-' + str(index % 12 + 1).zfill(2) + '-' + str(index % 28 + 1).zfill(2),  # nopep8
+            'html_content': html,
+            'article_text': text,
+            'article_len': len(text),
+            'domain': self.crawled[index % len(self.crawled)].source,
+            'found_urls': [{'title': '', 'url': link} for link in links],
+            'author_metascraper': 'Author ' + str(index % 100),
+            'title_metascraper': ''}
+
+    def tweet_row(self, index):
+        language = LANGUAGES[index % len(LANGUAGES)]
+        mentions = [{'username': self.rand.choice(self.sources).handle[1:]}
+                    for _ in range(self.rand.randint(0, 2))]
+        links = [self.link() for _ in range(self.num_links() // 4)]
+        return [self.tweet_url(index),
+                self.sources[index % len(self.sources)].handle,
+                self.text(140, language),
+                '2021-' + str(index % 12 + 1).zfill(2) + '-01', language, '[]',
+                repr({'mentions': mentions}), repr(links)]
+
+
+def generate(options):
+    """
+    Writes a corpus with options (see DEFAULTS) into options['dir'].
+    Returns the Corpus.
+    """
+    options = dict(DEFAULTS, **options)
+    corpus = Corpus(options)
+    root = options['dir']
+    for folder in ('DomainOutput', 'TwitterOutput'):
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+    for file_name, sources in (('citation_scope.csv', corpus.sources),
+                               ('crawl_scope.csv', corpus.crawled)):
+        with open(os.path.join(root, file_name), 'w', newline='', encoding='utf-8') as scope:  # nopep8
+            writer = csv.writer(scope)
+            writer.writerow(SCOPE_COLUMNS)
+            writer.writerows(source.scope_row() for source in sources)
+    for index in range(options['articles']):
+        article = corpus.article(index)
+        path = os.path.join(root, 'DomainOutput', uuid5_id(article['url']) + '.json')  # nopep8
+        with open(path, 'w', encoding='utf-8') as out:
+            json.dump(article, out, ensure_ascii=False)
+    with open(os.path.join(root, 'TwitterOutput', 'synthetic.csv'), 'w', newline='', encoding='utf-8') as out:  # nopep8
+        writer = csv.writer(out)
+        writer.writerow(TWITTER_COLUMNS)
+        for index in range(corpus.num_tweets):
+            writer.writerow(corpus.tweet_row(index))
+    return corpus
+
+
+def parse_options(args, defaults=DEFAULTS):
+    """Returns defaults updated with the -name=value options of args."""
+    options = dict(defaults)
+    for arg in args:
+        name, _, value = arg.lstrip('-').partition('=')
+        if name not in defaults or not value:
+            print('Unknown option ' + arg + ', the options are -' +
+                  '=, -'.join(defaults) + '=')
+            sys.exit(1)
+        options[name] = type(defaults[name])(value)
+    return options
+
+
+if __name__ == '__main__':
+    options = parse_options(sys.argv[1:])
+    generate(options)
+    print('wrote', options['articles'], 'articles to', options['dir'])
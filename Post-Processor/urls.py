@@ -0,0 +1,51 @@
+"""
+urls.py
+Description: Canonical form of the urls used as referral keys, so the
+same article linked as http:// or https://, with or without www., a
+trailing slash or tracking parameters is a single key. Canonical urls
+are memoized, since the same links are found in many articles.
+"""
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+# number of canonical urls kept in the memo cache
+CANONICAL_CACHE_SIZE = 1 << 20
+# query parameters that only track where a click came from
+TRACKING_PARAMS = frozenset(('fbclid', 'gclid', 'dclid', 'msclkid', 'igshid',
+                             'mc_cid', 'mc_eid', 'ref_src', 'ref_url', '_ga'))
+DEFAULT_PORTS = (':80', ':443')
+
+
+def is_tracking_param(param):
+    name = param.split('=', 1)[0].lower()
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def canonical_url(url):
+    """
+    Returns the canonical form of an http(s) url: https scheme, lowercase
+    host without 'www.' or a default port, no trailing slash, no tracking
+    query parameters and no fragment. The http(s) sources of a scope are
+    urls too, so 'https://www.example.com/' becomes 'https://example.com'.
+    Anything else, e.g. a twitter handle or an alias, is returned unchanged.
+    canonical_url(canonical_url(url)) == canonical_url(url).
+    """
+    if not isinstance(url, str) or not url[:8].lower().startswith(('http://', 'https://')):  # nopep8
+        return url
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    for port in DEFAULT_PORTS:
+        if host.endswith(port):
+            host = host[:-len(port)]
+    path = parts.path.rstrip('/')
+    query = '&'.join(param for param in parts.query.split('&')
+                     if param and not is_tracking_param(param))
+    if query:
+        return 'https://' + host + path + '?' + query
+    return 'https://' + host + path
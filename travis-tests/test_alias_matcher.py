@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+import alias_matcher  # nopep8
+from alias_matcher import AhoCorasick, AliasMatcher  # nopep8
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_overlapping_keys(self):
+        """
+        Every occurrence of every key is reported, overlapping ones included.
+        """
+        automaton = AhoCorasick()
+        for key in ['he', 'she', 'his', 'hers']:
+            automaton.add(key)
+        automaton.build()
+        matches = automaton.search('ushers')
+        self.assertEqual(sorted(matches),
+                         [(1, 4, 'she'), (2, 4, 'he'), (2, 6, 'hers')])
+
+
+class TestAliasMatcher(unittest.TestCase):
+    def setUp(self):
+        self.scope = {
+            'https://www.aljazeera.com/': {'aliases': ['Al Jazeera', 'Jazeera'],
+                                           'twitter_handles': ['AJEnglish']},
+            '@IsraelinIndia': {'aliases': [],
+                               'twitter_handles': ['IsraelinIndia']}
+        }
+        self.matcher = AliasMatcher(self.scope)
+
+    def test_alias_needs_boundaries(self):
+        """
+        Aliases must be surrounded by a space, quote or comma.
+        """
+        found = self.matcher.found_by_source('read "al jazeera", today')
+        self.assertEqual(found, {'https://www.aljazeera.com/':
+                                 ['Al Jazeera', 'Jazeera']})
+        self.assertEqual(self.matcher.found_by_source(' aljazeera '), {})
+
+    def test_handles_in_scope_order(self):
+        """
+        Handles are matched case insensitively after an '@'.
+        """
+        found = self.matcher.found_by_source('via @ajenglish and @israelinindia')  # nopep8
+        self.assertEqual(list(found), ['https://www.aljazeera.com/',
+                                       '@IsraelinIndia'])
+        self.assertEqual(found['@IsraelinIndia'], ['IsraelinIndia'])
+
+    def test_prefilter_rejects_documents(self):
+        """
+        Documents without a word of an alias or an '@' before a handle
+        are rejected, take_stats returns the counts and resets them.
+        """
+        self.assertEqual(self.matcher.found_by_source('no sources here'), {})
+        self.assertEqual(self.matcher.found_by_source(' jazeera '),
+                         {'https://www.aljazeera.com/': ['Jazeera']})
+        stats = self.matcher.take_stats()
+        self.assertEqual(stats['documents'], 2)
+        self.assertEqual(stats['rejected'], 1)
+        self.assertEqual(self.matcher.take_stats()['documents'], 0)
+
+    def test_prefilter_keeps_handle_prefixes(self):
+        """
+        A handle is matched at the start of a longer word after an '@',
+        as by the automaton.
+        """
+        text = 'via @AJEnglishNews, al jazeera '
+        found = self.matcher.found_by_source(text)
+        self.assertEqual(found, {'https://www.aljazeera.com/':
+                                 ['Al Jazeera', 'Jazeera', 'AJEnglish']})
+        threshold = alias_matcher.AUTOMATON_MIN_CANDIDATES
+        alias_matcher.AUTOMATON_MIN_CANDIDATES = 1
+        try:
+            self.assertEqual(self.matcher.found_by_source(text), found)
+        finally:
+            alias_matcher.AUTOMATON_MIN_CANDIDATES = threshold
+        self.assertEqual(self.matcher.take_stats()['automaton'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
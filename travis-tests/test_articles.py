@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+from articles import ArticleRecord, iter_domain_files, parse_mentions, parse_str_list  # nopep8
+
+
+class TestArticleRecord(unittest.TestCase):
+    def setUp(self):
+        self.article = {'id': 'a1', 'url': 'https://a.com/1', 'domain': 'https://a.com/',  # nopep8
+                        'html_content': '<p>hi</p>', 'article_len': 2,
+                        'found_urls': [{'title': 't', 'url': 'https://b.com/'}],
+                        'other field': 1}
+
+    def test_like_a_dict(self):
+        """
+        A record has the fields, lookups and items of the article.
+        """
+        record = ArticleRecord(self.article)
+        self.assertEqual(dict(record.items()), self.article)
+        self.assertEqual(record['found_urls'][0]['url'], 'https://b.com/')
+        self.assertIn('other field', record)
+        self.assertNotIn('date', record)
+        self.assertIsNone(record.get('date'))
+        with self.assertRaises(KeyError):
+            record['date']
+        record.update({'completed': True})
+        record.update([('citation name', ['A'])])
+        self.assertEqual((record['completed'], record['citation name']), (True, ['A']))  # nopep8
+        self.assertEqual(json.loads(json.dumps(dict(record.items())))['found_urls'],  # nopep8
+                         self.article['found_urls'])
+
+    def test_lazy(self):
+        """
+        With a path the heavy fields are read back from the file.
+        """
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = os.path.join(out_dir, 'a1.json')
+            with open(path, 'w') as out:
+                json.dump(self.article, out)
+            record = ArticleRecord(self.article, path)
+            self.assertNotIn('html_content', record.keys())
+            self.assertIsNone(record.get('html_content'))
+            self.assertEqual(record['html_content'], '<p>hi</p>')
+
+    def test_tweet_urls(self):
+        record = ArticleRecord({'found_urls': ['https://a.com/1']})
+        self.assertEqual(list(record['found_urls']), ['https://a.com/1'])
+        self.assertEqual(dict(record.items()), {'found_urls': ['https://a.com/1']})
+
+
+class TestDomainFiles(unittest.TestCase):
+    def test_bad_files_skipped(self):
+        """
+        Files that can not be parsed are logged, added to errors and
+        skipped, with one process or a pool, and the others are loaded.
+        """
+        with tempfile.TemporaryDirectory() as domain_dir:
+            for name, text in [('a1.json', '{"url": "https://a.com/1"}'),
+                               ('a2.json', '{"url": "https://a.com/2", '),
+                               ('a3.json', '["not", "an", "article"]'),
+                               ('a4.json', '{"url": "https://a.com/4"}')]:
+                with open(os.path.join(domain_dir, name), 'w') as out:
+                    out.write(text)
+            for num_procs in [1, 2]:
+                errors = []
+                with self.assertLogs(level='WARNING') as logs:
+                    articles = dict(iter_domain_files(domain_dir, num_procs, errors=errors,
+                                                      file_names=['a1.json', 'a2.json',
+                                                                  'a3.json', 'a4.json']))
+                self.assertEqual([article['id'] for article in articles.values()], ['a1', 'a4'])  # nopep8
+                self.assertEqual([os.path.basename(path) for path, _ in errors],
+                                 ['a2.json', 'a3.json'])
+                self.assertEqual(len(logs.records), 2)
+
+
+class TestParseCells(unittest.TestCase):
+    def test_parse_str_list(self):
+        """
+        Simple and escaped lists are parsed, empty, NaN and
+        malformed cells raise ValueError or SyntaxError.
+        """
+        self.assertEqual(parse_str_list("['https://a.com/1', 'https://b.com/']"),
+                         ['https://a.com/1', 'https://b.com/'])
+        self.assertEqual(parse_str_list('[]'), [])
+        self.assertEqual(parse_str_list('["it\'s", \'a\\\\b\']'), ["it's", 'a\\b'])
+        for cell in ['', 'nan', float('nan'), "['https://a.com/1'", '[1, ']:
+            with self.assertRaises((ValueError, SyntaxError)):
+                parse_str_list(cell)
+
+    def test_parse_mentions(self):
+        """
+        Usernames are read from the entities, empty, NaN and
+        malformed cells have no mentions.
+        """
+        entities = "{'mentions': [{'start': 0, 'end': 9, 'username': 'AJEnglish'}, " + \
+            "{'username': 'BBCWorld'}], 'urls': []}"
+        self.assertEqual(parse_mentions(entities), ['AJEnglish', 'BBCWorld'])
+        self.assertEqual(parse_mentions('{\'mentions\': [{"username": "a.b"}]}'),
+                         ['a.b'])
+        for cell in ['', 'nan', float('nan'), '{}', "{'mentions': [{'username'",
+                     "{'mentions': 'x'}"]:
+            self.assertEqual(parse_mentions(cell), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+from checkpoint import CheckpointLog, replay  # nopep8
+
+FIELDS = ('citation url or text alias', 'citation name', 'anchor text')
+
+
+class TestCheckpointLog(unittest.TestCase):
+    def test_resume(self):
+        """
+        Replaying the log marks the logged articles completed and
+        restores their fields and referrals, a torn line is skipped.
+        """
+        with tempfile.TemporaryDirectory() as run_dir:
+            path = os.path.join(run_dir, 'checkpoint.log')
+            with CheckpointLog(path, every=1) as log:
+                log.add('domain', 'https://a.com/1',
+                        [['BBC'], ['BBC'], []], ['https://b.com/2', 'BBC'])
+            with open(path, 'a') as torn:
+                torn.write('["twitter","https://twitter.com/a/st')
+            with CheckpointLog(path, append=True) as log:
+                log.add('twitter', 'https://twitter.com/a/status/1',
+                        [['@b'], ['B'], []], ['B'])
+            data = {'domain': {'https://a.com/1': {'id': 'a1', 'completed': False},
+                               'https://a.com/3': {'id': 'a3', 'completed': False}},
+                    'twitter': {'https://twitter.com/a/status/1':
+                                {'id': 't1', 'completed': False}}}
+            referrals = replay(data, FIELDS, path)
+        article = data['domain']['https://a.com/1']
+        self.assertTrue(article['completed'])
+        self.assertEqual(article['citation name'], ['BBC'])
+        self.assertFalse(data['domain']['https://a.com/3']['completed'])
+        self.assertTrue(data['twitter']['https://twitter.com/a/status/1']['completed'])
+        self.assertEqual(referrals['domain'].to_dict(),
+                         {'https://b.com/2': ['a1'], 'BBC': ['a1']})
+        self.assertEqual(referrals['twitter'].to_dict(), {'B': ['t1']})
+
+
+if __name__ == '__main__':
+    unittest.main()
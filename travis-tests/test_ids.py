@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+import os
+import sys
+import unittest
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+from ids import node_id, node_info, uuid5_ids  # nopep8
+
+
+class TestIds(unittest.TestCase):
+    def test_same_as_uuid5(self):
+        """
+        Cached and bulk ids are the uuid5 of the name.
+        """
+        names = ['https://haaretz.com/article/1', '@BBCWorld', 'הארץ',
+                 '@BBCWorld']
+        expected = [str(uuid.uuid5(uuid.NAMESPACE_DNS, name)) for name in names]
+        self.assertEqual(uuid5_ids(names), expected)
+        self.assertEqual([node_id(name) for name in names], expected)
+
+    def test_node_info(self):
+        """
+        The domain of a node is its url without the path.
+        """
+        self.assertEqual(node_info('https://bbc.co.uk/news/1'),
+                         (node_id('https://bbc.co.uk/news/1'), 'https://bbc.co.uk'))
+
+
+if __name__ == '__main__':
+    unittest.main()
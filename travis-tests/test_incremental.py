@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+from incremental import RunState, scan_files  # nopep8
+
+
+class TestRunState(unittest.TestCase):
+    def test_save_and_load(self):
+        """
+        A saved state loads back with lazy articles, and only new or
+        changed files are reported as changed.
+        """
+        with tempfile.TemporaryDirectory() as run_dir:
+            domain_path = os.path.join(run_dir, 'DomainOutput')
+            state_dir = os.path.join(run_dir, 'state') + '/'
+            os.makedirs(domain_path)
+            article = {'id': 'a1', 'url': 'https://a.com/1', 'domain': 'a.com',
+                       'html_content': '<p>hi</p>', 'completed': True}
+            with open(os.path.join(domain_path, 'a1.json'), 'w') as out:
+                json.dump(article, out)
+            state = RunState()
+            state.domain_data[article['url']] = article
+            state.referrals['domain'].add('https://b.com/', 'a1')
+            state.manifest['domain'] = scan_files(domain_path, '.json')
+            state.save(state_dir)
+
+            with open(os.path.join(domain_path, 'a2.json'), 'w') as out:
+                json.dump({'id': 'a2'}, out)
+            loaded = RunState.load(state_dir, domain_path)
+            files = scan_files(domain_path, '.json')
+            self.assertEqual(loaded.changed_files('domain', files), ['a2.json'])
+            loaded_article = loaded.domain_data['https://a.com/1']
+            self.assertNotIn('html_content', dict(loaded_article))
+            self.assertEqual(loaded_article['html_content'], '<p>hi</p>')
+            self.assertEqual(loaded.referrals['domain'].to_dict(),
+                             {'https://b.com': ['a1']})
+            self.assertEqual(RunState.load(run_dir + '/none/').manifest,
+                             {'domain': {}, 'twitter': {}})
+
+    def test_drop(self):
+        """
+        Dropping files removes the articles and tweets read from them
+        and their referrals, deleted files are reported as removed.
+        """
+        state = RunState()
+        state.domain_data = {'https://a.com/1': {'id': 'a1'},
+                             'https://a.com/2': {'id': 'a2'}}
+        state.twitter_data = {'https://twitter.com/a/status/1': {'id': 't1'}}
+        state.twitter_files = {'t.csv': ['t1', 't2']}
+        state.manifest = {'domain': {'a1.json': [1, 1], 'a2.json': [1, 1]},
+                          'twitter': {'t.csv': [1, 1]}}
+        state.referrals['domain'].update({'https://b.com/': ['a1', 'a2']})
+        state.referrals['twitter'].update({'https://b.com/': ['t1'],
+                                           'https://c.com/': ['t2']})
+        self.assertEqual(state.removed_files('domain', {'a2.json': [1, 1]}),
+                         ['a1.json'])
+        self.assertEqual(state.drop('domain', ['a1.json']),
+                         ({'a1'}, ['https://a.com/1'], ['https://b.com']))
+        self.assertEqual(list(state.domain_data), ['https://a.com/2'])
+        self.assertEqual(state.referrals['domain']['https://b.com/'], ['a2'])
+        ids, urls, keys = state.drop('twitter', ['t.csv'])
+        self.assertEqual((ids, urls), ({'t1', 't2'}, ['https://twitter.com/a/status/1']))  # nopep8
+        self.assertEqual(sorted(keys), ['https://b.com', 'https://c.com'])
+        self.assertEqual((state.twitter_data, state.twitter_files), ({}, {}))
+        self.assertEqual(state.drop('twitter', []), (set(), [], []))
+
+    def test_sort_referrals(self):
+        """
+        The referring ids come in file order, the ids of the kept
+        articles and tweets before the pruned ones.
+        """
+        state = RunState()
+        state.domain_data = {'https://a.com/2': {'id': 'a2'},
+                             'https://a.com/1': {'id': 'a1'}}
+        state.twitter_data = {'https://twitter.com/a/status/1': {'id': 't1'}}
+        state.twitter_files = {'t.csv': ['t2', 't1']}
+        state.referrals['domain'].update({'https://b.com/': ['a3', 'a2', 'a1']})
+        state.referrals['twitter'].update({'https://b.com/': ['t2', 't1']})
+        state.sort_referrals({'domain': ['a1.json', 'a3.json', 'a2.json'],
+                              'twitter': ['t.csv']})
+        self.assertEqual(state.referrals['domain']['https://b.com/'], ['a1', 'a2', 'a3'])
+        self.assertEqual(state.referrals['twitter']['https://b.com/'], ['t1', 't2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+import metrics  # nopep8
+from metrics import Metrics, format_seconds  # nopep8
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_stage_parts_add_up(self):
+        """
+        A stage started several times adds up its items.
+        """
+        run = Metrics()
+        with run.stage('match_domain', 2) as stage:
+            stage.add()
+            stage.add()
+        stage = run.start('match_domain', 3)
+        stage.add(3)
+        stage.stop()
+        self.assertEqual(run.stages['match_domain'].items, 5)
+        self.assertGreater(run.stages['match_domain'].seconds, 0)
+
+    def test_record_and_count(self):
+        run = Metrics()
+        run.record('write_output.csv', 1.5, 10)
+        run.record('write_output.csv', 0.5, 10)
+        run.count('domain_load_errors')
+        run.count('domain_load_errors', 2)
+        stages = run.to_dict()['stages']
+        self.assertEqual(stages['write_output.csv'],
+                         {'seconds': 2.0, 'items': 20, 'items_per_sec': 10.0})
+        self.assertEqual(run.counters, {'domain_load_errors': 3})
+
+    def test_write(self):
+        """
+        The metrics are written as json.
+        """
+        run = Metrics()
+        run.record('merge', 0, 4)
+        path = os.path.join(self.dir, 'run_metrics.json')
+        run.write(path)
+        with open(path) as metrics_file:
+            written = json.load(metrics_file)
+        self.assertEqual(written['stages']['merge']['items'], 4)
+        self.assertIsNone(written['stages']['merge']['items_per_sec'])
+        self.assertIn('total_seconds', written)
+
+    def test_progress_is_throttled(self):
+        """
+        Progress is only reported once PROGRESS_INTERVAL has passed.
+        """
+        reports = []
+        interval = metrics.PROGRESS_INTERVAL
+        stage = Metrics().start('load_twitter', 100)
+        stage.report = lambda: reports.append(stage.items)
+        try:
+            metrics.PROGRESS_INTERVAL = 3600
+            stage.add(10)
+            self.assertEqual(reports, [])
+            metrics.PROGRESS_INTERVAL = 0
+            stage.add(10)
+            self.assertEqual(reports, [20])
+        finally:
+            metrics.PROGRESS_INTERVAL = interval
+
+    def test_format_seconds(self):
+        self.assertEqual(format_seconds(3725.9), '1:02:05')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import csv
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+from openpyxl import load_workbook  # nopep8
+from output_sink import OUTPUT_COLUMNS, ListSink, OutputSink, ParquetSink, XlsxSink, pa  # nopep8
+
+
+class TestOutputSink(unittest.TestCase):
+    def test_buffered_rows(self):
+        """
+        Rows end up after the title row, in the order they were written.
+        """
+        rows = [tuple(str(i) + column for column in OUTPUT_COLUMNS)
+                for i in range(5)]
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = os.path.join(out_dir, 'output.csv')
+            with OutputSink(path, buffer_rows=2) as sink:
+                sink.write_rows(rows[:2])
+                sink.write_rows(rows[2:])
+            self.assertEqual(sink.num_rows, 5)
+            with open(path, newline='') as csv_file:
+                written = [tuple(row) for row in csv.reader(csv_file)]
+        self.assertEqual(written, [OUTPUT_COLUMNS] + rows)
+
+    def test_list_sink(self):
+        """
+        A ListSink keeps all the rows in order once it is closed.
+        """
+        rows = [(str(i),) for i in range(5)]
+        with ListSink(buffer_rows=2) as sink:
+            sink.write_rows(rows)
+        self.assertEqual(sink.rows, rows)
+        self.assertEqual(sink.num_rows, 5)
+
+    def test_xlsx_rollover(self):
+        """
+        Cells are unicode escaped and rows go on to a new sheet
+        once a sheet is full.
+        """
+        row = ('id1', 'https://a.com/\u05d0', ['id2'], 1) + ('',) * 11
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = os.path.join(out_dir, 'output.xlsx')
+            with XlsxSink(path, buffer_rows=2, max_rows=3) as sink:
+                sink.write_rows([row] * 5)
+            workbook = load_workbook(path, read_only=True)
+            sheets = [list(sheet.values) for sheet in workbook.worksheets]
+            workbook.close()
+        self.assertEqual([len(rows) for rows in sheets], [3, 3, 2])
+        self.assertEqual(sheets[0][0], (None,) + OUTPUT_COLUMNS)
+        self.assertEqual(sheets[2][1][:5],
+                         (4, 'id1', 'https://a.com/\\u05d0', "['id2']", 1))
+
+    @unittest.skipIf(pa is None, 'pyarrow is not installed')
+    def test_parquet_lists(self):
+        """
+        The list columns of the parquet output are real lists.
+        """
+        row = ('id1', 'https://a.com/x', ['id2', 'id3'], 2, 'article', '',
+               '', 'A', 'author', '2020', 'text', ['@a', 'alias'],
+               ['A', 'A'], [], 'title')
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = os.path.join(out_dir, 'output.parquet')
+            with ParquetSink(path) as sink:
+                sink.write(row)
+            table = pa.parquet.read_table(path).to_pydict()
+        self.assertEqual(table['referring record id'], [['id2', 'id3']])
+        self.assertEqual(table['number of referrals'], [2])
+        self.assertEqual(table['tags'], [[]])
+        self.assertEqual(table['citation url or text alias'], [['@a', 'alias']])
+        self.assertEqual(table['anchor text'], [[]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+# processor.py logs to ./logs/ and reads its input from the working
+# directory, so it is imported and run in a temporary one
+WORK_DIR = tempfile.mkdtemp()
+os.makedirs(os.path.join(WORK_DIR, 'logs'))
+os.chdir(WORK_DIR)
+import processor  # nopep8
+from checkpoint import CheckpointLog, replay  # nopep8
+import synthetic_corpus  # nopep8
+from referral_store import ReferralStore  # nopep8
+from scope_index import ScopeIndex  # nopep8
+from sqlite_store import SqliteStore  # nopep8
+
+
+def tearDownModule():
+    os.chdir('/')
+    shutil.rmtree(WORK_DIR)
+
+
+def write_csv(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as out:
+        csv.writer(out).writerows(rows)
+
+
+class TestLoadTwitter(unittest.TestCase):
+    def test_url_column_required(self):
+        """
+        A csv without a tweet_url column is skipped instead of loading
+        all of its rows as one tweet with an empty url.
+        """
+        write_csv('./TwitterOutput/tweets.csv', [
+            ['tweet_url', 'twitter_handle', 'text', 'citation_urls'],
+            ['https://twitter.com/a/status/1', '@a', 'hi', "['https://b.com/']"],
+            ['https://twitter.com/a/status/2', '@a', 'hey', '']])
+        write_csv('./TwitterOutput/no_url.csv', [
+            ['Source', 'Plain Text of Article or Tweet'], ['@a', 'hi'], ['@b', 'hey']])
+        errors = processor.METRICS.counters.get('twitter_load_errors', 0)
+        data, pairings = processor.load_twitter_csv(['tweets.csv', 'no_url.csv'])
+        self.assertEqual(list(data), ['https://twitter.com/a/status/1',
+                                      'https://twitter.com/a/status/2'])
+        self.assertEqual(list(data['https://twitter.com/a/status/1']['found_urls']),
+                         ['https://b.com/'])
+        self.assertEqual(list(data['https://twitter.com/a/status/2']['found_urls']), [])
+        self.assertEqual(len(pairings), 2)
+        self.assertEqual(processor.METRICS.counters['twitter_load_errors'], errors + 1)
+
+
+class TestLoadJson(unittest.TestCase):
+    def test_bad_files_counted(self):
+        """
+        A corrupt domain file is skipped and counted, the valid ones
+        next to it are loaded, also by a pool of processes.
+        """
+        os.makedirs('./DomainOutput', exist_ok=True)
+        for name, text in [('a1.json', '{"url": "https://a.com/1", "domain": "a.com"}'),
+                           ('a2.json', '{"url": "https://a.com/2", '),
+                           ('a3.json', '{"url": "https://a.com/3", "domain": "a.com"}')]:
+            with open('./DomainOutput/' + name, 'w') as out:
+                out.write(text)
+        for num_procs in [1, 2]:
+            errors = processor.METRICS.counters.get('domain_load_errors', 0)
+            data, pairings = processor.load_json(num_procs=num_procs)
+            self.assertEqual(sorted(pairings), ['a1', 'a3'])
+            self.assertEqual(sorted(data), ['https://a.com/1', 'https://a.com/3'])
+            self.assertEqual(processor.METRICS.counters['domain_load_errors'], errors + 1)
+
+
+def rows_by_id(rows):
+    """Returns the rows of an output.csv, after its title row, by id."""
+    return {row[0]: row for row in rows[1:]}
+
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as rows:
+        return list(csv.reader(rows))
+
+
+class CorpusTestCase(unittest.TestCase):
+    """Runs the processor on a small synthetic corpus in its own directory."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus_dir = tempfile.mkdtemp(dir=WORK_DIR)
+        os.chdir(cls.corpus_dir)
+        for folder in ['logs', 'Output', 'Saved', 'tempFiles/Domain', 'tempFiles/Twitter']:
+            os.makedirs(folder)
+        synthetic_corpus.generate({'articles': 60, 'html_size': 2000,
+                                   'sources': 20, 'alias_density': 0.02})
+        cls.crawl_scope = ScopeIndex(processor.load_scope('./crawl_scope.csv'))
+        cls.citation_scope = ScopeIndex(processor.load_scope('./citation_scope.csv'))
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(WORK_DIR)
+        processor.NUM_PROCS = -1
+
+    def load_data(self, num_procs):
+        """Loads the corpus with num_procs processes, returns the
+        domain data, twitter data and their pairings."""
+        processor.NUM_PROCS = num_procs
+        twitter_data, twitter_pairs = processor.load_twitter_csv()
+        domain_data, domain_pairs = processor.load_json(num_procs=num_procs)
+        return domain_data, twitter_data, domain_pairs, twitter_pairs
+
+    def run_processor(self, num_procs, output_dir):
+        """Matches the corpus and writes its output with num_procs
+        processes, returns the rows of output.csv."""
+        os.makedirs(output_dir)
+        domain_data, twitter_data, domain_pairs, twitter_pairs = self.load_data(num_procs)
+        domain_data, domain_referrals, twitter_data, twitter_referrals = \
+            processor.match_data(domain_data, twitter_data, self.citation_scope)
+        processor.write_output(domain_data, twitter_data, domain_referrals,
+                               twitter_referrals, self.crawl_scope, self.citation_scope,
+                               domain_pairs, twitter_pairs, output_dir=output_dir)
+        return read_rows(output_dir + 'output.csv')
+
+
+class TestMultiProcess(CorpusTestCase):
+    def test_same_output(self):
+        """
+        Matching and cross matching on a pool of processes write the
+        same rows as a single process.
+        """
+        single = self.run_processor(-1, 'single/')
+        multi = self.run_processor(3, 'multi/')
+        self.assertGreater(len(single), 10)
+        self.assertEqual(multi, single)
+        # the referrals are written to disk and merged back
+        with mock.patch.object(processor, 'MEM_LIMIT', 2000):
+            spilled = self.run_processor(3, 'spilled/')
+        self.assertEqual(spilled, single)
+
+    def test_workers_do_not_compact(self):
+        """
+        The referral stores are compacted before the cross matching pool
+        forks, so its processes only read them.
+        """
+        log = os.path.abspath('compactions.txt')
+
+        def logged(method):
+            def compact(store):
+                if len(store._pending) or store._pending_arrays or store._offsets is None:  # nopep8
+                    with open(log, 'a') as out:
+                        out.write(str(os.getpid()) + '\n')
+                return method(store)
+            return compact
+
+        with mock.patch.object(ReferralStore, 'compact', logged(ReferralStore.compact)), \
+                mock.patch.object(ReferralStore, '_key_offsets', logged(ReferralStore._key_offsets)):  # nopep8
+            self.run_processor(3, 'frozen/')
+        with open(log) as pids:
+            self.assertEqual(set(pids.read().split()), {str(os.getpid())})
+
+
+class TestSqlite(CorpusTestCase):
+    def test_one_pool(self):
+        """
+        With processes, one pool matches all the batches of the database,
+        and the rows are those of a run with one process in memory.
+        """
+        single = self.run_processor(-1, 'single/')
+        iter_pending = SqliteStore.iter_pending
+
+        def small_batches(store, kind, batch_size=None):
+            return iter_pending(store, kind, 20)
+
+        processor.NUM_PROCS = 3
+        with mock.patch.object(SqliteStore, 'iter_pending', small_batches), \
+                mock.patch.object(processor, 'frozen_pool', wraps=processor.frozen_pool) as pool:  # nopep8
+            processor.process_sqlite(self.crawl_scope, self.citation_scope)
+        self.assertEqual(pool.call_count, 1)
+        self.assertEqual(read_rows('Output/output.csv'), single)
+
+
+class TestResume(CorpusTestCase):
+    def test_same_output(self):
+        """
+        A run resumed from a checkpoint log, with one or more processes,
+        writes the same rows as a run that was not interrupted.
+        """
+        full = self.run_processor(-1, 'full/')
+        log = os.path.abspath('checkpoint.log')
+        domain_data, twitter_data, _, _ = self.load_data(-1)
+        with CheckpointLog(log) as checkpoint:
+            processor.match_data(domain_data, twitter_data, self.citation_scope, checkpoint)  # nopep8
+        # keep every other article, so completed ones come between the others
+        with open(log) as records:
+            records = records.readlines()
+        with open(log, 'w') as out:
+            out.writelines(records[::2])
+        for num_procs in [-1, 3]:
+            shutil.rmtree('Output')
+            os.makedirs('Output')
+            domain_data, twitter_data, domain_pairs, twitter_pairs = self.load_data(num_procs)  # nopep8
+            replayed = replay({'domain': domain_data, 'twitter': twitter_data},
+                              processor.CITATION_FIELDS, log)
+            processor.process_crawler(domain_data, twitter_data, self.crawl_scope,
+                                      self.citation_scope, domain_pairs, twitter_pairs,
+                                      replayed['domain'], replayed['twitter'])
+            self.assertEqual(read_rows('Output/output.csv'), full)
+
+
+class TestIncremental(CorpusTestCase):
+    def edit_corpus(self):
+        """Deletes and changes tweets, changes an article and deletes another."""
+        files = sorted(os.listdir('./DomainOutput'))
+        with open('./DomainOutput/' + files[1]) as article_file:
+            article = json.load(article_file)
+        path = './TwitterOutput/synthetic.csv'
+        rows = read_rows(path)
+        rows = rows[:1] + rows[11:]
+        for row in rows[1:6]:
+            # citation_urls
+            row[-1] = repr([article['url']])
+        write_csv(path, rows)
+        os.remove('./DomainOutput/' + files[0])
+        article['found_urls'] = article['found_urls'][:1]
+        article['html_content'] = '<p>no citations</p>'
+        with open('./DomainOutput/' + files[1], 'w') as article_file:
+            json.dump(article, article_file)
+
+    def test_changed_files(self):
+        """
+        After files are changed and deleted, the rows of the first run,
+        replaced by those of the incremental run and without its
+        removed_ids, are the rows of a full run.
+        """
+        processor.process_incremental(self.crawl_scope, self.citation_scope)
+        rows = rows_by_id(read_rows('Output/output.csv'))
+        self.edit_corpus()
+        processor.process_incremental(self.crawl_scope, self.citation_scope)
+        update_dir = 'Output/' + [name for name in os.listdir('Output')
+                                  if name.startswith('update_')][0] + '/'
+        removed = [row[0] for row in read_rows(update_dir + 'removed_ids.csv')[1:]]
+        self.assertTrue(removed)
+        for row_id in removed:
+            rows.pop(row_id, None)
+        rows.update(rows_by_id(read_rows(update_dir + 'output.csv')))
+        full = rows_by_id(self.run_processor(-1, 'full/'))
+        self.assertEqual(rows, full)
+
+
+if __name__ == '__main__':
+    unittest.main()
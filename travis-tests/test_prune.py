@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+from prune import LoadFilter, iso_date  # nopep8
+
+
+def article(number, domain, date='2021-01-10'):
+    return {'id': 'a' + str(number), 'domain': domain, 'date': date,
+            'found_urls': [{'title': '', 'url': 'https://a.com/' + str(number + 1)}]}  # nopep8
+
+
+class TestLoadFilter(unittest.TestCase):
+    def setUp(self):
+        self.crawl_scope = {'https://a.com/': {}, 'https://b.com/': {}}
+        self.referrals = []
+
+    def add_referral(self, url, article_id):
+        self.referrals.append((url, article_id))
+
+    def test_crawl_scope(self):
+        """
+        Articles out of the crawl scope are pruned, their links kept.
+        """
+        load_filter = LoadFilter(self.crawl_scope)
+        articles = [article(1, 'https://a.com/'), article(2, 'https://c.com/')]
+        kept = list(load_filter.filter('domain', articles, self.add_referral))
+        self.assertEqual([a['id'] for a in kept], ['a1'])
+        self.assertEqual(self.referrals, [('https://a.com/3', 'a2')])
+        self.assertEqual(load_filter.pruned, {'domain': 1, 'twitter': 0})
+
+    def test_window_and_domains(self):
+        """
+        Articles out of the date window or the domain subset are pruned,
+        articles without an iso date are kept.
+        """
+        load_filter = LoadFilter(self.crawl_scope, '2021-01-01', '2021-01-31',
+                                 {'https://a.com/'})
+        self.assertTrue(load_filter.keep('domain', article(1, 'https://a.com/')))  # nopep8
+        self.assertTrue(load_filter.keep('domain', article(1, 'https://a.com/', '')))  # nopep8
+        self.assertFalse(load_filter.keep('domain', article(1, 'https://b.com/')))  # nopep8
+        self.assertFalse(load_filter.keep('domain', article(1, 'https://a.com/', '2021-02-01T10:00:00')))  # nopep8
+        tweet = {'id': 't1', 'domain': '@a', 'date': '2020-12-31',
+                 'found_urls': ['https://b.com/1']}
+        self.assertEqual(list(load_filter.filter('twitter', [tweet], self.add_referral)), [])  # nopep8
+        self.assertEqual(self.referrals, [('https://b.com/1', 't1')])
+
+    def test_iso_date(self):
+        self.assertEqual(iso_date('2021-03-04T05:06:07Z'), '2021-03-04')
+        self.assertIsNone(iso_date('Wed Oct 10 20:19:24 +0000 2018'))
+        self.assertIsNone(iso_date(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
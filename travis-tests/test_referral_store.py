@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+from referral_store import ReferralStore, merge_runs, write_run  # nopep8
+
+
+class TestReferralStore(unittest.TestCase):
+    def test_dedupe_and_order(self):
+        """
+        Ids are deduped and returned in the order they were first seen.
+        """
+        store = ReferralStore()
+        for url, article_id in [('a', 'id2'), ('b', 'id1'), ('a', 'id1'),
+                                ('a', 'id2'), ('c', 'id3')]:
+            store.add(url, article_id)
+        self.assertEqual(list(store), ['a', 'b', 'c'])
+        self.assertEqual(store['a'], ['id2', 'id1'])
+        self.assertEqual(store.num_edges(), 4)
+        self.assertNotIn('d', store)
+        self.assertIsNone(store.get('d'))
+
+    def test_reserve_ids(self):
+        """
+        Reserved ids are returned in the order they were reserved in.
+        """
+        store = ReferralStore()
+        store.reserve_ids(['id1', 'id2'])
+        store.add('a', 'id3')
+        store.add('a', 'id2')
+        store.add('a', 'id1')
+        self.assertEqual(store['a'], ['id1', 'id2', 'id3'])
+
+    def test_merge(self):
+        """
+        Merging a store or a dict unions the ids of each url.
+        """
+        first = ReferralStore.from_dict({'a': ['id1'], 'b': ['id2']})
+        second = ReferralStore.from_dict({'a': ['id3', 'id1']})
+        first.update(second)
+        first.update({'c': ['id1', 'id1']})
+        self.assertEqual(first.to_dict(), {'a': ['id1', 'id3'],
+                                           'b': ['id2'], 'c': ['id1']})
+
+    def test_remove_ids(self):
+        """
+        Removing ids drops their edges and returns the urls that lost one.
+        """
+        store = ReferralStore.from_dict({'a': ['id1', 'id2'], 'b': ['id2'],
+                                         'c': ['id3']})
+        self.assertEqual(store.remove_ids(['id2', 'id4']), ['a', 'b'])
+        self.assertEqual(store.to_dict(), {'a': ['id1'], 'b': [], 'c': ['id3']})
+        self.assertEqual(store.remove_ids(['id4']), [])
+        store.add('b', 'id2')
+        self.assertEqual(store['b'], ['id2'])
+
+    def test_merge_runs(self):
+        """
+        Sorted runs written to disk merge back into the same referrals.
+        """
+        runs = [{'b': ['id1'], 'a': ['id2']}, {'a': ['id2', 'id3']},
+                {'c': ['id4'], 'a': ['id1']}]
+        with tempfile.TemporaryDirectory() as run_dir:
+            paths = []
+            for i, referrals in enumerate(runs):
+                paths.append(os.path.join(run_dir, str(i) + '.jsonl'))
+                write_run(ReferralStore.from_dict(referrals), paths[-1])
+            merged = ReferralStore()
+            self.assertEqual(merge_runs(paths, merged), 3)
+        self.assertEqual(merged.to_dict(), {'a': ['id2', 'id3', 'id1'],
+                                            'b': ['id1'], 'c': ['id4']})
+
+
+if __name__ == '__main__':
+    unittest.main()
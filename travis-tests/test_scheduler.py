@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+import scheduler  # nopep8
+from scheduler import ARTICLE_COST, LINK_COST, WorkerTimes, article_cost, cost_chunks  # nopep8
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.min_chunk_cost = scheduler.MIN_CHUNK_COST
+        scheduler.MIN_CHUNK_COST = 0
+
+    def tearDown(self):
+        scheduler.MIN_CHUNK_COST = self.min_chunk_cost
+
+    def test_article_cost(self):
+        """
+        The html is used if it is in memory, article_len otherwise.
+        """
+        links = [{'url': 'https://a.com/1'}, {'url': 'https://a.com/2'}]
+        self.assertEqual(article_cost({'html_content': 'x' * 1000, 'article_len': 5,
+                                       'found_urls': links}),
+                         ARTICLE_COST + 1000 + 2 * LINK_COST)
+        self.assertEqual(article_cost({'article_len': 5, 'found_urls': []}),
+                         ARTICLE_COST + 5)
+        self.assertEqual(article_cost({'article_text': 'tweet', 'found_urls': ['x']}),  # nopep8
+                         ARTICLE_COST + 5 + LINK_COST)
+
+    def test_heavy_articles_first(self):
+        """
+        Every node is in one chunk, the costly ones come first and
+        alone, and the chunks get smaller.
+        """
+        nodes = ['n' + str(i) for i in range(100)]
+        costs = [1] * 100
+        costs[70] = costs[90] = 1000
+        chunks = cost_chunks(nodes, costs, 2, max_items=30)
+        self.assertEqual(chunks[0], ['n70'])
+        self.assertEqual(chunks[1], ['n90'])
+        self.assertEqual(sorted(sum(chunks, [])), sorted(nodes))
+        self.assertTrue(all(len(chunk) <= 30 for chunk in chunks))
+        self.assertGreaterEqual(len(chunks[2]), len(chunks[-1]))
+
+    def test_worker_times(self):
+        workers = WorkerTimes()
+        workers.add(11, 1.0, 10)
+        workers.add(12, 3.0, 5)
+        workers.add(11, 1.5, 10)
+        report = workers.report(4.0)
+        self.assertEqual([(worker['busy_seconds'], worker['idle_seconds'], worker['chunks'])  # nopep8
+                          for worker in report], [(2.5, 1.5, 2), (3.0, 1.0, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+import scope_index  # nopep8
+from scope_index import ScopeIndex, split_url  # nopep8
+
+
+def scope_entry(aliases=(), handles=()):
+    return {'Name': '', 'Type': 'News Source', 'Publisher': '', 'Tags': [],
+            'aliases': list(aliases), 'twitter_handles': list(handles)}
+
+
+class TestScopeIndex(unittest.TestCase):
+    def setUp(self):
+        self.scope = ScopeIndex({
+            'https://aljazeera.com/': scope_entry(['Al Jazeera'], ['AJEnglish']),  # nopep8
+            'https://news.example.co.uk/': scope_entry(),
+            '@IsraelinIndia': scope_entry(handles=['@IsraelinIndia ']),
+        })
+
+    def test_host_lookup(self):
+        """
+        A source is found by its domain with and without www.,
+        case insensitively, and the subdomain of a source is kept.
+        """
+        self.assertEqual(self.scope.domains['https://aljazeera.com/'],
+                         'aljazeera.com')
+        self.assertEqual(self.scope.domains['https://news.example.co.uk/'],
+                         'news.example.co.uk')
+        for host in ['aljazeera.com', 'www.aljazeera.com']:
+            self.assertEqual(self.scope.host_to_sources[host],
+                             ['https://aljazeera.com/'])
+        self.assertNotIn('example.co.uk', self.scope.host_to_sources)
+
+    def test_domain_lookup(self):
+        """
+        Sources are looked up by their lowercase domain, non http
+        sources have none, and positions follow the scope order.
+        """
+        self.assertEqual(self.scope.domain_to_sources['news.example.co.uk'],
+                         ['https://news.example.co.uk/'])
+        self.assertNotIn('@IsraelinIndia', self.scope.domains)
+        self.assertEqual(self.scope.position['@IsraelinIndia'], 2)
+
+    def test_handle_lookup(self):
+        """
+        Handles are normalized: no '@', no surrounding spaces, lowercase,
+        and map back to their source and handle as written in the scope.
+        """
+        self.assertEqual(self.scope.handles['@IsraelinIndia'], {'israelinindia'})
+        self.assertEqual(self.scope.handle_to_sources['ajenglish'],
+                         [('https://aljazeera.com/', 'AJEnglish')])
+        self.assertEqual(self.scope.handle_to_sources['israelinindia'],
+                         [('@IsraelinIndia', '@IsraelinIndia ')])
+
+    def test_sources_for_host(self):
+        """
+        A host finds the sources of its domain and of its parent domains.
+        """
+        self.assertEqual(self.scope.sources_for_host('aljazeera.com'),
+                         ['https://aljazeera.com/'])
+        self.assertEqual(self.scope.sources_for_host('a.news.example.co.uk'),
+                         ['https://news.example.co.uk/'])
+        self.assertEqual(self.scope.sources_for_host('example.co.uk'), [])
+
+    def test_anchor_citations(self):
+        """
+        In scope links are found with their anchor text, an unclosed
+        anchor does not hide the links after it.
+        """
+        html = '<a href="http://www.aljazeera.com/a">unclosed\n' + \
+            '<A HREF=\'https://aljazeera.com/b\' class="x">Read</A>'
+        found = self.scope.find_anchor_citations(
+            html, self.scope.extract('https://other.com/'))
+        self.assertEqual(found, {'https://aljazeera.com/':
+                                 [('https://aljazeera.com/b', 'Read')]})
+
+    def test_nested_anchors(self):
+        """
+        An anchor nested in one of the same source is skipped, one of
+        another source is found.
+        """
+        text = 'x <a href="http://aljazeera.com/b">' + \
+            '<a href="https://news.example.co.uk/n">n'
+        found = self.scope.find_anchor_citations(
+            '<a href="http://aljazeera.com/a">' + text + '</a>',
+            self.scope.extract('https://other.com/'))
+        self.assertEqual(found, {
+            'https://aljazeera.com/': [('http://aljazeera.com/a', text)],
+            'https://news.example.co.uk/': [('https://news.example.co.uk/n', 'n')]})
+
+    def test_anchor_time_limit(self):
+        """
+        A page of unclosed anchors on one line is scanned once, and
+        pages are given up on after ANCHOR_TIME_LIMIT seconds.
+        """
+        html = '<a href="http://aljazeera.com/x">text ' * 20000
+        ext = self.scope.extract('https://other.com/')
+        self.assertEqual(self.scope.find_anchor_citations(html, ext), {})
+        limit = scope_index.ANCHOR_TIME_LIMIT
+        scope_index.ANCHOR_TIME_LIMIT = -1
+        try:
+            with self.assertLogs(level='WARNING'):
+                found = self.scope.find_anchor_citations(
+                    html + '</a>', ext, 'https://other.com/page')
+        finally:
+            scope_index.ANCHOR_TIME_LIMIT = limit
+        self.assertEqual(found, {})
+
+
+class TestSplitUrl(unittest.TestCase):
+    def test_split_url(self):
+        """
+        Returns the lowercase host, and the handle of twitter urls
+        followed by more of the path.
+        """
+        self.assertEqual(split_url('https://News.Example.com/a/b'),
+                         ('news.example.com', None))
+        self.assertEqual(split_url('https://twitter.com/AJEnglish/status/1'),
+                         ('twitter.com', 'ajenglish'))
+        self.assertEqual(split_url('https://twitter.com/AJEnglish'),
+                         ('twitter.com', None))
+        self.assertEqual(split_url('http://[broken'), ('', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+from sqlite_store import SqliteStore  # nopep8
+
+
+def article(url, uid):
+    return {'url': url, 'id': uid, 'domain': 'a.com', 'completed': False}
+
+
+class TestSqliteStore(unittest.TestCase):
+    def test_match_and_join(self):
+        """
+        Pending articles are paged until completed, and the join
+        returns the deduped referrals of each article in order.
+        """
+        with tempfile.TemporaryDirectory() as run_dir:
+            with SqliteStore(os.path.join(run_dir, 'test.db'), batch_size=2) as store:
+                store.add_article('domain', article('https://a.com/1', 'a1'), 'a.com')
+                store.add_article('domain', article('https://a.com/2', 'a2'), 'a.com')
+                store.add_article('twitter', article('https://t.co/1', 't1'), '@a')
+                store.flush()
+                batches = list(store.iter_pending('domain', batch_size=1))
+                self.assertEqual([len(batch) for batch in batches], [1, 1])
+                first = batches[0][0]
+                first['citation name'] = ['A']
+                store.complete_article(first)
+                store.add_referrals('domain', {'https://a.com/2': ['a1', 'a2']})
+                store.add_referrals('twitter', {'https://a.com/2': ['t1', 'a1']})
+                store.flush()
+                self.assertEqual(store.count('domain', completed=False), 1)
+                rows = [(kind, row['id'], ids)
+                        for kind, row, ids in store.iter_referred_articles()]
+                self.assertIn('a1', store.pairings('domain'))
+                self.assertNotIn('a1', store.pairings('twitter'))
+                self.assertEqual(store.pairings('twitter')['t1'],
+                                 {'url': 'https://t.co/1', 'twitter_handle': '@a'})
+        self.assertEqual(rows, [('domain', 'a1', []), ('domain', 'a2', ['a1', 't1']),
+                                ('twitter', 't1', [])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+import benchmark  # nopep8
+import synthetic_corpus  # nopep8
+
+
+class TestSyntheticCorpus(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def generate(self, name, **options):
+        options = dict({'dir': os.path.join(self.dir, name), 'articles': 30,
+                        'html_size': 500, 'sources': 10}, **options)
+        synthetic_corpus.generate(options)
+        return options['dir']
+
+    def read(self, root, *path):
+        with open(os.path.join(root, *path), encoding='utf-8') as file:
+            return file.read()
+
+    def test_corpus_files(self):
+        """
+        One json file per article, a tweet per article and the scopes.
+        """
+        root = self.generate('corpus')
+        files = os.listdir(os.path.join(root, 'DomainOutput'))
+        self.assertEqual(len(files), 30)
+        article = json.loads(self.read(root, 'DomainOutput', files[0]))
+        for key in ('url', 'domain', 'html_content', 'article_text', 'found_urls'):  # nopep8
+            self.assertIn(key, article)
+        with open(os.path.join(root, 'TwitterOutput', 'synthetic.csv'), encoding='utf-8') as tweets:  # nopep8
+            self.assertEqual(len(list(csv.DictReader(tweets))), 30)
+        with open(os.path.join(root, 'citation_scope.csv'), encoding='utf-8') as scope:  # nopep8
+            rows = list(csv.DictReader(scope))
+        self.assertEqual(len(rows), 10)
+        self.assertTrue(all(row['Text Aliases'] for row in rows))
+
+    def test_hebrew_and_arabic(self):
+        root = self.generate('corpus')
+        text = ''.join(json.loads(self.read(root, 'DomainOutput', name))['html_content']  # nopep8
+                       for name in os.listdir(os.path.join(root, 'DomainOutput')))  # nopep8
+        self.assertRegex(text, '[֐-׿]')
+        self.assertRegex(text, '[؀-ۿ]')
+
+    def test_same_seed_same_corpus(self):
+        first = self.generate('first')
+        second = self.generate('second')
+        self.assertEqual(self.read(first, 'TwitterOutput', 'synthetic.csv'),
+                         self.read(second, 'TwitterOutput', 'synthetic.csv'))
+        self.assertEqual(sorted(os.listdir(os.path.join(first, 'DomainOutput'))),  # nopep8
+                         sorted(os.listdir(os.path.join(second, 'DomainOutput'))))  # nopep8
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_stage_times(self):
+        """
+        Output stages are added up.
+        """
+        metrics = {'total_seconds': 5, 'stages': {
+            'load_domain': {'seconds': 1.0},
+            'write_output.csv': {'seconds': 0.5},
+            'write_output.xlsx': {'seconds': 1.5}}}
+        self.assertEqual(benchmark.stage_times(metrics),
+                         {'load_json': 1.0, 'output': 2.0, 'total': 5})
+
+    def test_regressions(self):
+        baseline = {'1000': {'load_json': 10, 'output': 0.1}}
+        results = {'1000': {'load_json': 14, 'output': 0.3, 'merge': 1}}
+        self.assertEqual(benchmark.regressions(results, baseline, 0.25),
+                         [('1000', 'load_json', 14, 10)])
+
+    def test_run_twice(self):
+        """
+        Each benchmark run starts without the output of the last one.
+        """
+        with tempfile.TemporaryDirectory() as root:
+            synthetic_corpus.generate({'dir': root, 'articles': 30,
+                                       'html_size': 500, 'sources': 10})
+            for _ in range(2):
+                benchmark.run_processor(root, [])
+            with open(os.path.join(root, 'Output', 'output.csv'), encoding='utf-8') as out:
+                self.assertEqual(out.read().count('id,url,'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
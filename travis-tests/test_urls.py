@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'Post-Processor'))
+from urls import canonical_url  # nopep8
+from referral_store import ReferralStore  # nopep8
+
+
+class TestCanonicalUrl(unittest.TestCase):
+    def test_variants(self):
+        """
+        Scheme, www., case of the host, default ports, trailing slashes,
+        tracking parameters and fragments do not change the key.
+        """
+        variants = ['http://example.com/a/b', 'https://www.example.com/a/b/',
+                    'HTTPS://Example.com:443/a/b?utm_source=x&fbclid=y',
+                    'https://example.com/a/b#top']
+        self.assertEqual({canonical_url(url) for url in variants},
+                         {'https://example.com/a/b'})
+        self.assertEqual(canonical_url('https://example.com/a?id=3&utm_medium=m'),
+                         'https://example.com/a?id=3')
+        self.assertNotEqual(canonical_url('https://example.com/A'),
+                            canonical_url('https://example.com/a'))
+
+    def test_not_urls(self):
+        """
+        Handles and aliases are kept as they are, and canonical urls
+        are their own canonical form.
+        """
+        for key in ['Al Jazeera', '@BBCWorld', "['BBC', 'BBC News']", '']:
+            self.assertEqual(canonical_url(key), key)
+        url = canonical_url('http://www.example.com/a/?x=1')
+        self.assertEqual(canonical_url(url), url)
+
+    def test_store_keys(self):
+        """
+        Variants of a url are one key of a ReferralStore.
+        """
+        store = ReferralStore()
+        store.add('http://www.example.com/a/', 'id1')
+        store.add('https://example.com/a?utm_campaign=c', 'id2')
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store['https://www.example.com/a'], ['id1', 'id2'])
+
+    def test_scope_source_keys(self):
+        """
+        A scope source given with https://www. is canonicalized like any
+        url, so it still finds the referrals to its bare domain.
+        """
+        source = 'https://www.aljazeera.com/'
+        self.assertEqual(canonical_url(source), 'https://aljazeera.com')
+        store = ReferralStore()
+        # a link to the bare domain, and the source found as an alias
+        store.add('http://aljazeera.com', 'id1')
+        store.add(source, 'id2')
+        self.assertIn(source, store)
+        self.assertEqual(store[source], ['id1', 'id2'])
+        self.assertEqual(store['https://aljazeera.com/'], ['id1', 'id2'])
+
+
+if __name__ == '__main__':
+    unittest.main()